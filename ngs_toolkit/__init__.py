@@ -177,12 +177,16 @@ def setup_graphic_preferences():
     It uses the values under "preferences:graphics:matplotlib:rcParams"
     and "preferences:graphics:seaborn:parameters" to matplotlib
     and seaborn respectively.
+    The matplotlib backend is set to "preferences:graphics:matplotlib:backend" if given.
     """
     import matplotlib
     import seaborn as sns
 
     graphics = _CONFIG["preferences"]["graphics"]
     # matplotlib
+    backend = graphics["matplotlib"].get("backend")
+    if backend is not None:
+        matplotlib.use(backend)
     rc_params = graphics["matplotlib"]["rcParams"]
     matplotlib.rcParams.update(rc_params)
     matplotlib.rcParams["svg.fonttype"] = "none"
@@ -1369,8 +1369,9 @@ class Analysis(object):
         implementation : :obj:`str`, optional
             One of ``Python`` or ``R``.
             Dictates which implementation is to be used.
-            The R implementation comes from the `preprocessCore` package,
-            and the Python one is from https://github.com/ShawnLYU/Quantile_Normalize.
+            The R implementation comes from the `preprocessCore` package
+            and requires rpy2, while the Python one is a vectorized NumPy version
+            of https://github.com/ShawnLYU/Quantile_Normalize.
             They give very similar results.
 
             Default is "Python".
@@ -1905,24 +1906,48 @@ class Analysis(object):
         stats : :class:`pandas.DataFrame`
             A DataFrame with statistics for each feature.
         """
+        import warnings
+
         matrix = self.get_matrix(matrix=matrix, samples=samples)
 
-        metrics = pd.DataFrame(index=pd.Index(matrix.index, name=self.var_unit_name))
-        # calculate mean coverage
-        metrics.loc[:, "mean"] = matrix.mean(axis=1)
-        # calculate coverage variance
-        metrics.loc[:, "variance"] = matrix.var(axis=1)
-        # calculate std deviation (sqrt(variance))
-        metrics.loc[:, "std_deviation"] = np.sqrt(metrics.loc[:, "variance"])
-        # calculate dispersion (variance / mean)
-        metrics.loc[:, "dispersion"] = metrics.loc[:, "variance"] / metrics.loc[:, "mean"]
-        # calculate qv2 (std / mean) ** 2
-        metrics.loc[:, "qv2"] = (metrics.loc[:, "std_deviation"] / metrics.loc[:, "mean"]) ** 2
-        # calculate "amplitude" (max - min)
-        metrics.loc[:, "amplitude"] = metrics.max(axis=1) - metrics.min(axis=1)
-        # calculate interquantile range
-        metrics.loc[:, "iqr"] = metrics.quantile(0.75, axis=1) - metrics.quantile(0.25, axis=1)
-        metrics.index.name = "index"
+        # Compute all statistics on a single array and assemble the dataframe once.
+        # NaN-aware reductions (like pandas' defaults) are only used if needed.
+        values = matrix.to_numpy(dtype=np.float64)
+        if np.isnan(values).any():
+            mean_func, var_func = np.nanmean, np.nanvar
+        else:
+            mean_func, var_func = np.mean, np.var
+        stats = np.empty((values.shape[0], 7))
+        with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            # calculate mean coverage
+            stats[:, 0] = mean_func(values, axis=1)
+            # calculate coverage variance
+            stats[:, 1] = var_func(values, axis=1, ddof=1)
+            # calculate std deviation (sqrt(variance))
+            np.sqrt(stats[:, 1], out=stats[:, 2])
+            # calculate dispersion (variance / mean)
+            np.divide(stats[:, 1], stats[:, 0], out=stats[:, 3])
+            # calculate qv2 (std / mean) ** 2
+            np.square(stats[:, 2] / stats[:, 0], out=stats[:, 4])
+            # calculate "amplitude" (max - min)
+            stats[:, 5] = np.nanmax(stats[:, :5], axis=1) - np.nanmin(stats[:, :5], axis=1)
+            # calculate interquantile range
+            q25, q75 = np.nanquantile(stats[:, :6], [0.25, 0.75], axis=1)
+            stats[:, 6] = q75 - q25
+        metrics = pd.DataFrame(
+            stats,
+            index=pd.Index(matrix.index, name="index"),
+            columns=[
+                "mean",
+                "variance",
+                "std_deviation",
+                "dispersion",
+                "qv2",
+                "amplitude",
+                "iqr",
+            ],
+        )
         if save:
             metrics.to_csv(
                 os.path.join(self.results_dir, self.name + ".{}.csv".format(output_prefix)),
@@ -2000,7 +2025,6 @@ class Analysis(object):
             samples = self.samples
         matrix = getattr(self, matrix)
 
-        next_matrix = matrix
         # add closest gene
         msg = "`{}` attribute does not exist."
 
@@ -2016,17 +2040,15 @@ class Analysis(object):
             else:
                 feature_tables = ["stats"]
 
+        # gather the new columns of each table and join them all at once
+        columns = matrix.columns
+        to_join = list()
         for matrix_name in feature_tables:
             if hasattr(self, matrix_name):
                 cur_matrix = getattr(self, matrix_name)
-                matrix_features = pd.merge(
-                    next_matrix,
-                    cur_matrix[cur_matrix.columns.difference(next_matrix.columns)],
-                    left_index=True,
-                    right_index=True,
-                    how="left",
-                )
-                next_matrix = matrix_features
+                cur_matrix = cur_matrix[cur_matrix.columns.difference(columns)]
+                columns = columns.append(cur_matrix.columns)
+                to_join.append(cur_matrix)
             else:
                 if not permissive:
                     _LOGGER.error(msg.format(matrix_name))
@@ -2034,8 +2056,10 @@ class Analysis(object):
                 else:
                     _LOGGER.warning(msg.format(matrix_name) + " Proceeding anyway.")
 
-        if "matrix_features" not in locals():
-            matrix_features = next_matrix
+        if to_join:
+            matrix_features = matrix.join(to_join, how="left")
+        else:
+            matrix_features = matrix
 
         # Pair indexes
         msg = "Annotated matrix does not have same feature length as matrix_raw matrix."
@@ -2278,13 +2302,12 @@ class Analysis(object):
             # Add either colors based on categories or numerical scale
             if dtype == "categorical":
                 _LOGGER.debug("Level '{}' has a categorical type.".format(level.name, dtype))
-                n = len(set(values))
+                # encode values once, in order of appearance (nan cases get code -1)
+                codes, uniques = pd.factorize(values)
+                n = len(uniques)
                 # get n equidistant colors
                 p = [_pallete(1.0 * i / n) for i in range(n)]
-                color_dict = dict(zip(list(set(index.get_level_values(level.name))), p))
-                # color for nan cases
-                color_dict[np.nan] = nan_color
-                col = [color_dict[x] for x in index.get_level_values(level.name)]
+                col = [p[c] if c >= 0 else nan_color for c in codes]
             else:
                 # Create a range of either 0-max if only positive values are found
                 # or symmetrically from the maximum absolute value found
@@ -2315,9 +2338,7 @@ class Analysis(object):
                     col = _diverging_cmap(norm(values.astype(float)))
 
                 # replace color for nan cases
-                col[
-                    np.where(index.get_level_values(level.name).to_series().isnull().tolist())
-                ] = nan_color
+                col[np.asarray(values.isnull())] = nan_color
             # append vector (list) of sample values to list of levels
             colors.append([tuple(x) for x in col])
 
@@ -2453,7 +2474,7 @@ class Analysis(object):
         from sklearn.decomposition import PCA
         from sklearn.preprocessing import StandardScaler
         from statsmodels.sandbox.stats.multicomp import multipletests
-        from scipy.stats import kruskal, pearsonr
+        from scipy.stats import kruskal, t as t_distribution
 
         output_dir = self._format_string_with_attributes(output_dir)
         if not os.path.exists(output_dir):
@@ -2472,14 +2493,12 @@ class Analysis(object):
             _LOGGER.info(msg + hint)
             matrix = self.annotate_samples(matrix=matrix, save=False, assign=False)
 
+        matrix_samples = matrix.columns.get_level_values("sample_name")
+        available = set(matrix_samples)
         if samples is None:
-            samples = [
-                s for s in self.samples if s.name in matrix.columns.get_level_values("sample_name")
-            ]
+            samples = [s for s in self.samples if s.name in available]
         else:
-            samples = [
-                s for s in samples if s.name in matrix.columns.get_level_values("sample_name")
-            ]
+            samples = [s for s in samples if s.name in available]
         if len(samples) == 0:
             msg = "None of the samples could be found in the quantification matrix."
             _LOGGER.error(msg)
@@ -2523,9 +2542,9 @@ class Analysis(object):
             raise ValueError(msg)
 
         # All regions, matching samples (provided samples in matrix)
-        x = matrix.loc[
-            :, matrix.columns.get_level_values("sample_name").isin([s.name for s in samples]),
-        ]
+        # the matrix is only read, so it is not copied if all of its samples are used
+        selected = matrix_samples.isin([s.name for s in samples])
+        x = matrix if selected.all() else matrix.loc[:, selected]
 
         # Get matrix of samples vs levels with colors as values
         cd_kwargs = {
@@ -2569,14 +2588,20 @@ class Analysis(object):
 
         if "correlation" in steps:
             # Pairwise correlations
+            names = x.columns.get_level_values("sample_name")
+            values = x.values.astype(float, copy=False)
+            cd = color_dataframe
+            cd.index = cd.index.get_level_values("sample_name")
             for method in ["pearson", "spearman"]:
                 _LOGGER.info("Plotting pairwise correlation with '{}' metric.".format(method))
-                xp = x.copy()
-                xp.columns = xp.columns.get_level_values("sample_name")
-                xp = xp.astype(float).corr(method)
+                if np.isnan(values).any():
+                    # pairwise complete observations
+                    xp = pd.DataFrame(values, columns=names).corr(method)
+                else:
+                    # Spearman is the Pearson correlation of ranks
+                    v = values if method == "pearson" else pd.DataFrame(values).rank().values
+                    xp = pd.DataFrame(np.corrcoef(v, rowvar=False), index=names, columns=names)
 
-                cd = color_dataframe
-                cd.index = cd.index.get_level_values("sample_name")
                 g = sns.clustermap(
                     xp,
                     xticklabels=False,
@@ -2587,6 +2612,7 @@ class Analysis(object):
                     cbar_kws={"label": "{} correlation".format(method.capitalize())},
                     row_colors=cd,
                     col_colors=cd,
+                    rasterized=rasterized,
                 )
                 g.ax_heatmap.set_yticklabels(
                     g.ax_heatmap.get_yticklabels(), rotation=0, fontsize="xx-small"
@@ -2621,6 +2647,7 @@ class Analysis(object):
                 }
             )
             params.update(maniford_kwargs)
+            # manifolds are learned one at a time, as estimators already use all cores
             for algo in manifold_algorithms:
                 msg = "Learning manifold with '{}' algorithm".format(algo)
                 _LOGGER.info(msg + ".")
@@ -2766,31 +2793,39 @@ class Analysis(object):
 
                 _LOGGER.debug("Attribute '{}' is of type {}.".format(attr, variable_type))
 
+                # sample masks of each group are the same for every PC
+                trait_values = x_new.index.get_level_values(attr)
+                if variable_type == "categorical":
+                    masks = {group: (trait_values == group) for group in groups}
+                elif variable_type == "numerical":
+                    # Pearson correlation of the attribute with all PCs at once
+                    # and the two-sided p-value of its t statistic
+                    r = np.corrcoef(
+                        np.column_stack([np.asarray(trait_values, dtype=float), x_new.values]),
+                        rowvar=False,
+                    )[0, 1:]
+                    dof = x_new.shape[0] - 2
+                    with np.errstate(divide="ignore"):
+                        t_stat = r * np.sqrt(dof / (1 - np.minimum(r ** 2, 1.0)))
+                    p_values = 2 * t_distribution.sf(np.abs(t_stat), dof)
+
                 for pc in pcs_order:
                     _LOGGER.debug("Attribute '{}'; PC {}.".format(attr, pc + 1))
                     if variable_type == "categorical":
                         # It categorical, test pairwise combinations of attributes
+                        pc_values = x_new.values[:, pc]
                         for group1, group2 in itertools.combinations(groups, 2):
                             _LOGGER.debug("Testing group '{}' with '{}'.".format(group1, group2))
-                            g1_mask = x_new.index.get_level_values(attr) == group1
-                            g2_mask = x_new.index.get_level_values(attr) == group2
-
-                            g1_values = x_new.loc[g1_mask, pc]
-                            g2_values = x_new.loc[g2_mask, pc]
-
                             # Test ANOVA (or Kruskal-Wallis H-test)
-                            p = kruskal(g1_values, g2_values)[1]
+                            p = kruskal(pc_values[masks[group1]], pc_values[masks[group2]])[1]
 
                             # Append
                             associations.append([pc + 1, attr, variable_type, group1, group2, p])
 
                     elif variable_type == "numerical":
-                        # It numerical, calculate pearson correlation
-                        pc_values = x_new.loc[:, pc]
-                        trait_values = x_new.index.get_level_values(attr)
-                        p = pearsonr(pc_values, trait_values)[1]
-
-                        associations.append([pc + 1, attr, variable_type, np.nan, np.nan, p])
+                        associations.append(
+                            [pc + 1, attr, variable_type, np.nan, np.nan, p_values[pc]]
+                        )
                     else:
                         associations.append([pc + 1, attr, variable_type, np.nan, np.nan, np.nan])
 
@@ -3033,7 +3068,8 @@ class Analysis(object):
         # Handle samples under self
         if samples is None:
             samples = self.samples
-        samples = [s for s in samples if s.name in comparison_table["sample_name"].tolist()]
+        comparison_samples = set(comparison_table["sample_name"])
+        samples = [s for s in samples if s.name in comparison_samples]
 
         # Make output dir
         output_dir = self._format_string_with_attributes(output_dir)
@@ -3047,8 +3083,7 @@ class Analysis(object):
         samples = [
             s
             for s in samples
-            if (s.name in comparison_table["sample_name"].tolist())
-            & (s.name in count_matrix.columns)
+            if (s.name in comparison_samples) & (s.name in count_matrix.columns)
         ]
         count_matrix = count_matrix[[s.name for s in samples]]
 
@@ -3102,11 +3137,7 @@ class Analysis(object):
                 _LOGGER.debug("Filtering out unsupported regions.")
                 sup = self.support.loc[
                     :,
-                    [
-                        s.name
-                        for s in self.samples
-                        if s.name in comparison_table["sample_name"].tolist()
-                    ],
+                    [s.name for s in self.samples if s.name in comparison_samples],
                 ]
                 count_matrix = count_matrix.loc[(sup > 0).any(axis=1), :]
             results = deseq_analysis(
@@ -3160,8 +3191,9 @@ class Analysis(object):
                             comparison_name
                         )
                     )
+                    comp_samples = set(comp["sample_name"])
                     sup = self.support.loc[
-                        :, [s.name for s in self.samples if s.name in comp["sample_name"].tolist()],
+                        :, [s.name for s in self.samples if s.name in comp_samples],
                     ]
                     sup = sup.reindex(count.index).dropna()
                     count = count.reindex(sup[(sup > 0).any(axis=1)].index)
@@ -3250,7 +3282,7 @@ class Analysis(object):
         differential_results : :obj:`pandas.DataFrame`
             Pandas dataframe with results.
         """
-        from tqdm import tqdm
+        from joblib import Parallel, delayed
 
         if comparison_table is None:
             msg = "`comparison_table` was not given and is not set in analysis object."
@@ -3296,8 +3328,7 @@ class Analysis(object):
             _LOGGER.warning(msg)
             comps = comparison_table["comparison_name"].drop_duplicates().sort_values()
 
-        results = list()
-        for comp in tqdm(comps, total=len(comps), desc="Comparison"):
+        def read_comparison(comp):
             res_file = os.path.join(
                 input_dir, comp, input_prefix + ".deseq_result.{}.csv".format(comp)
             )
@@ -3309,10 +3340,16 @@ class Analysis(object):
                     _LOGGER.warning(
                         "Results file for comparison '{}' do not exist. Skipping.".format(comp)
                     )
-                    continue
+                    return None
                 else:
                     raise e
-            results.append(res2.reset_index())
+            return res2.reset_index()
+
+        # Read in results, one file per thread
+        results = Parallel(n_jobs=-1, prefer="threads")(
+            delayed(read_comparison)(comp) for comp in comps
+        )
+        results = [res for res in results if res is not None]
 
         if not results:
             msg = "No comparison had a valid results file!"
@@ -4599,44 +4636,33 @@ class Analysis(object):
             fill_value=0,
         )
 
-        intersections = pd.DataFrame(
-            columns=["group1", "group2", "dir1", "dir2", "size1", "size2", "intersection", "union",]
-        )
         perms = list(
             itertools.permutations(
                 piv.T.groupby(level=["comparison_name", "direction"]).groups.items(), 2
             )
         )
+        intersections = list()
         for ((k1, dir1), i1), ((k2, dir2), i2) in tqdm(
             perms, total=len(perms), desc="Permutations"
         ):
             i1 = set(piv[i1][piv[i1] == 1].dropna().index)
             i2 = set(piv[i2][piv[i2] == 1].dropna().index)
-            intersections = intersections.append(
-                pd.Series(
-                    [
-                        k1,
-                        k2,
-                        dir1,
-                        dir2,
-                        len(i1),
-                        len(i2),
-                        len(i1.intersection(i2)),
-                        len(i1.union(i2)),
-                    ],
-                    index=[
-                        "group1",
-                        "group2",
-                        "dir1",
-                        "dir2",
-                        "size1",
-                        "size2",
-                        "intersection",
-                        "union",
-                    ],
-                ),
-                ignore_index=True,
+            intersections.append(
+                [
+                    k1,
+                    k2,
+                    dir1,
+                    dir2,
+                    len(i1),
+                    len(i2),
+                    len(i1.intersection(i2)),
+                    len(i1.union(i2)),
+                ]
             )
+        intersections = pd.DataFrame(
+            intersections,
+            columns=["group1", "group2", "dir1", "dir2", "size1", "size2", "intersection", "union",],
+        )
         # convert to %
         intersections.loc[:, "intersection"] = intersections["intersection"].astype(float)
         intersections.loc[:, "perc_1"] = (
@@ -5396,6 +5422,7 @@ class Analysis(object):
         top_n=5,
         z_score=0,
         cmap=None,
+        max_terms=2000,
     ):
         """
         Make plots illustrating enrichment of features for various comparisons.
@@ -5469,6 +5496,13 @@ class Analysis(object):
             Colormap to use in heatmaps.
 
             Defaults to :obj:`None`.
+        max_terms : :obj:`int`, optional
+            Maximum number of terms to cluster in correlation plots and heatmaps.
+            If there are more, only the ones with largest absolute value
+            in any comparison are kept.
+            Pass :obj:`None` to keep all.
+
+            Defaults to 2000.
         """
         # TODO: split function in its smaller parts and call them appropriately.
         import matplotlib
@@ -5497,6 +5531,7 @@ class Analysis(object):
                 axis = iter(axis.flatten())
             else:
                 axis = iter(np.array([axis]))
+            color = sns.color_palette("colorblind")[0]
             for comp in top_data[group_variable].drop_duplicates().sort_values():
                 df2 = top_data.loc[top_data[group_variable] == comp, :]
                 ax = next(axis)
@@ -5506,7 +5541,7 @@ class Analysis(object):
                     estimator=max,
                     orient="horizontal",
                     ax=ax,
-                    color=sns.color_palette("colorblind")[0],
+                    color=color,
                 )
                 ax.set_title(comp)
             for ax in axis:
@@ -5514,9 +5549,16 @@ class Analysis(object):
             sns.despine(fig)
             savefig(fig, output_file)
 
+        def limit_terms(input_df):
+            if (max_terms is None) or (input_df.shape[0] <= max_terms):
+                return input_df
+            _LOGGER.debug("Keeping only top {} terms for clustering.".format(max_terms))
+            return input_df.loc[input_df.abs().max(axis=1).nlargest(max_terms).index]
+
         def enrichment_correlation_plot(
             input_df, output_file, label="Pearson correlation of enrichment"
         ):
+            input_df = limit_terms(input_df)
             try:
                 g = sns.clustermap(
                     input_df.T.corr(),
@@ -5542,6 +5584,7 @@ class Analysis(object):
             if params is None:
                 params = dict()
             # plot clustered heatmap
+            input_df = limit_terms(input_df)
             shape = input_df.shape
 
             # # fix some labels
@@ -5616,6 +5659,7 @@ class Analysis(object):
                         top_n=top_n if step != "meme" else 300,
                         z_score=z_score,
                         cmap=cmap,
+                        max_terms=max_terms,
                     )
                 return
 
@@ -5652,6 +5696,9 @@ class Analysis(object):
                 + enrichment_table["direction"].astype(str)
             )
 
+        # comparisons in the order they are plotted
+        comparisons = enrichment_table[comp_variable].drop_duplicates().sort_values()
+
         if enrichment_type == "region":
             _LOGGER.info("Plotting enrichments for 'region'")
             from ngs_toolkit.graphics import plot_region_context_enrichment
@@ -5714,8 +5761,9 @@ class Analysis(object):
                         "CONFIG:resources:lola:region_set_labeling_columns"
                     )
                 )
-            enrichment_table.loc[:, "label"] = (
-                enrichment_table[cols].astype(str).apply(", ".join, axis=1)
+            labels = enrichment_table[cols].astype(str)
+            enrichment_table.loc[:, "label"] = labels[cols[0]].str.cat(
+                labels[cols[1:]], sep=", ", na_rep="nan"
             )
             enrichment_table.loc[:, "label"] = (
                 enrichment_table["label"]
@@ -5746,7 +5794,7 @@ class Analysis(object):
 
             # Significance vs fold enrichment over background
             if "scatter" in plot_types:
-                n = len(enrichment_table[comp_variable].drop_duplicates())
+                n = len(comparisons)
                 n_side = int(np.ceil(np.sqrt(n)))
                 fig, axis = plt.subplots(
                     n_side,
@@ -5757,9 +5805,7 @@ class Analysis(object):
                     squeeze=False,
                 )
                 axis = axis.flatten()
-                for i, comp in enumerate(
-                    enrichment_table[comp_variable].drop_duplicates().sort_values()
-                ):
+                for i, comp in enumerate(comparisons):
                     enr = enrichment_table[enrichment_table[comp_variable] == comp].reset_index(
                         drop=True
                     )
@@ -5789,7 +5835,7 @@ class Analysis(object):
                 )
 
             # Plot heatmaps of terms for each comparison
-            if len(enrichment_table[comp_variable].drop_duplicates()) < 2:
+            if len(comparisons) < 2:
                 return
 
             # pivot table
@@ -5854,7 +5900,7 @@ class Analysis(object):
                     ),
                 )
 
-            if len(enrichment_table[comp_variable].drop_duplicates()) < 2:
+            if len(comparisons) < 2:
                 return
             # Plot heatmaps of terms for each comparison
             if ("correlation" not in plot_types) and ("heatmap" not in plot_types):
@@ -5931,15 +5977,13 @@ class Analysis(object):
 
             # Significance vs fold enrichment over background
             if "scatter" in plot_types:
-                n = len(enrichment_table[comp_variable].drop_duplicates())
+                n = len(comparisons)
                 n_side = int(np.ceil(np.sqrt(n)))
                 fig, axis = plt.subplots(
                     n_side, n_side, figsize=(3 * n_side, 3 * n_side), sharex=False, sharey=False,
                 )
                 axis = axis.flatten()
-                for i, comp in enumerate(
-                    enrichment_table[comp_variable].drop_duplicates().sort_values()
-                ):
+                for i, comp in enumerate(comparisons):
                     enr = enrichment_table[enrichment_table[comp_variable] == comp]
                     enr.loc[:, "Motif Name"] = (
                         enr["Motif Name"]
@@ -5982,7 +6026,7 @@ class Analysis(object):
                 )
 
             # Plot heatmaps of terms for each comparison
-            if len(enrichment_table[comp_variable].drop_duplicates()) < 2:
+            if len(comparisons) < 2:
                 return
 
             for label, metric in [
@@ -6046,7 +6090,7 @@ class Analysis(object):
                 _LOGGER.debug(gene_set_library)
 
                 # Plot top_n terms of each comparison in barplots
-                n = len(enrichment_table[comp_variable].drop_duplicates())
+                n = len(comparisons)
                 n_side = int(np.ceil(np.sqrt(n)))
 
                 if "barplots" in plot_types:
@@ -6124,7 +6168,7 @@ class Analysis(object):
                     )
 
                 # Plot heatmaps of terms for each comparison
-                if len(enrichment_table[comp_variable].drop_duplicates()) < 2:
+                if len(comparisons) < 2:
                     continue
 
                 # pivot table
@@ -6206,7 +6250,7 @@ class Analysis(object):
                     )
 
                 # Plot heatmaps of terms for each comparison
-                if len(enrichment_table[comp_variable].drop_duplicates()) < 2:
+                if len(comparisons) < 2:
                     return
 
                 # pivot table
@@ -346,7 +346,7 @@ class ATACSeqAnalysis(Analysis):
         """
         from tqdm import tqdm
         import pybedtools
-        import tempfile
+        from ngs_toolkit.utils import read_bed_coordinates
 
         if region_type not in ["summits", "peaks"]:
             msg = "`region_type` attribute must be one of 'summits' or 'peaks'!"
@@ -371,57 +371,61 @@ class ATACSeqAnalysis(Analysis):
                 _LOGGER.error(msg)
                 raise AttributeError(msg)
 
-        f = tempfile.NamedTemporaryFile()
-        with open(f.name, "a") as handle:
-            for sample in tqdm(samples, total=len(samples), desc="Sample"):
-                try:
-                    file = (
-                        pybedtools.BedTool(sample.summits)
-                        .slop(b=extension, genome=sample.genome)
-                        .fn
-                        if region_type == "summits"
-                        else sample.peaks
+        # Read only the coordinates of each sample's regions and extend summits
+        # in memory (equivalent to `bedtools slop`), instead of one process per sample
+        chrom_sizes = dict()
+        regions = list()
+        for sample in tqdm(samples, total=len(samples), desc="Sample"):
+            file = sample.summits if region_type == "summits" else sample.peaks
+            try:
+                bed = read_bed_coordinates(file)
+            except (ValueError, FileNotFoundError):
+                if not permissive:
+                    raise
+                else:
+                    _LOGGER.warning("Peaks for sample {} ({}) not found!".format(sample, file))
+                    continue
+            if region_type == "summits":
+                if sample.genome not in chrom_sizes:
+                    chrom_sizes[sample.genome] = pd.Series(
+                        {c: s[1] for c, s in pybedtools.chromsizes(sample.genome).items()}
                     )
-                except (ValueError, FileNotFoundError):
-                    if not permissive:
-                        raise
-                    else:
-                        _LOGGER.warning(
-                            "Peaks for sample {} ({}) not found!".format(sample, sample.peaks)
-                        )
-                        continue
-                for line in open(file, "r"):
-                    handle.write(line)
+                sizes = bed["chrom"].map(chrom_sizes[sample.genome])
+                end = bed["end"] + extension
+                bed["start"] = (bed["start"] - extension).clip(lower=0)
+                bed["end"] = end.mask(end > sizes, sizes).astype(np.int64)
+            regions.append(bed)
+        regions = pd.concat(regions, ignore_index=True)
+
+        # # filter requested chromosomes
+        # (done before merging since merged regions never span chromosomes)
+        if filter_chroms is not None:
+            if isinstance(filter_chroms, list):
+                regions = regions.loc[~regions["chrom"].isin(filter_chroms)]
+            elif isinstance(filter_chroms, str):
+                regions = regions.loc[~regions["chrom"].str.match(filter_chroms)]
 
         # NCBI genome FASTA files are sorted naturally while Ensembl are not
         # depending on that you might want to sort the resulting BED file
         # accordingly with the following:
         #     sites = sort_bed(f.name).merge()
-        sites = pybedtools.BedTool(f.name).sort().merge()
+        sites = pybedtools.BedTool.from_dataframe(regions).sort().merge()
 
         # Filter
         # # remove blacklist regions
         if blacklist_bed is not False:
-            if not isinstance(blacklist_bed, pybedtools.BedTool):
+            if isinstance(blacklist_bed, pybedtools.BedTool):
+                blacklist = blacklist_bed
+            else:
                 blacklist = pybedtools.BedTool(blacklist_bed)
             sites = sites.intersect(v=True, b=blacklist)
 
-        # # filter requested chromosomes
-        if filter_chroms is not None:
-            if isinstance(filter_chroms, list):
-                sites = sites.filter(lambda x: x.chrom not in filter_chroms).saveas()
-            elif isinstance(filter_chroms, str):
-                s = sites.to_dataframe()
-                sites = pybedtools.BedTool.from_dataframe(
-                    s.loc[~s["chrom"].str.match(filter_chroms)]
-                )
-
         # Save and assign
         if save:
             output_file = os.path.join(self.results_dir, self.name + ".peak_set.bed")
-            sites.saveas(output_file)
+            # the returned BedTool already points to the saved file
+            sites = sites.saveas(output_file)
             self.record_output_file(output_file, "consensus_sites")
-            sites = pybedtools.BedTool(output_file)
         if assign:
             self.sites = sites
         return sites
@@ -444,17 +448,20 @@ class ATACSeqAnalysis(Analysis):
         sites : :class:`~pybedtools.BedTool`
             Sets a `sites` variable with consensus peak set.
         """
+        import shutil
         import pybedtools
 
         self.sites = pybedtools.BedTool(bed_file)
         if overwrite:
             default_sites = os.path.join(self.results_dir, self.name + ".peak_set.bed")
-            # pybedtools will pipe to the input file!
-            if bed_file == default_sites:
-                self.sites.saveas(default_sites + ".new")
-                os.rename(default_sites + ".new", default_sites)
-            else:
+            # nothing to write if the file is already the default one
+            if os.path.abspath(bed_file) == os.path.abspath(default_sites):
+                return
+            # plain files can simply be copied, anything else is re-serialized
+            if bed_file.endswith(".gz"):
                 self.sites.saveas(default_sites)
+            else:
+                shutil.copyfile(bed_file, default_sites)
         # TODO: warn if not overwrite and file exists already
 
     @check_has_attributes(["sites"])
@@ -506,10 +513,9 @@ class ATACSeqAnalysis(Analysis):
             A dataframe with counts of peaks overlapping each feature of consensus set.
         """
         # TODO: Implement distributed
+        from joblib import Parallel, delayed
         from tqdm import tqdm
-        import pybedtools
-        import tempfile
-        from ngs_toolkit.utils import bed_to_index
+        from ngs_toolkit.utils import bed_to_index, count_bed_overlaps, read_bed_coordinates
 
         if samples is None:
             samples = self.samples
@@ -520,43 +526,28 @@ class ATACSeqAnalysis(Analysis):
         )
 
         # calculate support (number of samples overlaping each merged peak)
-        for i, sample in tqdm(enumerate(samples), total=len(samples), desc="Sample"):
-            if region_type == "summits":
-                peaks = sample.summits
-            else:
-                peaks = sample.peaks
-            # print(sample, peaks)
-            if i == 0:
-                support = self.sites.intersect(peaks, wa=True, c=True)
-            else:
-                support = support.intersect(peaks, wa=True, c=True)
-
-        try:
-            support = support.to_dataframe()
-        except (
-            ValueError,
-            pybedtools.MalformedBedLineError,
-            pybedtools.helpers.BEDToolsError,
-            OverflowError,
-        ):
-            _LOGGER.debug(
-                "Could not convert support intersection directly to dataframe,"
-                "saving/reading temporary file."
-            )
-            t = tempfile.NamedTemporaryFile()
-            support.saveas(t.name)
-            support = pd.read_csv(t.name, sep="\t", header=None)
+        support = read_bed_coordinates(self.sites.fn)
+        counts = np.zeros((support.shape[0], len(samples)), dtype=np.int64)
 
-        support.columns = ["chrom", "start", "end"] + [sample.name for sample in samples]
+        def count_overlaps(i, peaks):
+            counts[:, i] = count_bed_overlaps(support, read_bed_coordinates(peaks))
+
+        # reading the files dominates, so samples are processed in threads
+        # which fill their own column of ``counts``
+        Parallel(n_jobs=-1, prefer="threads")(
+            delayed(count_overlaps)(i, sample.summits if region_type == "summits" else sample.peaks)
+            for i, sample in tqdm(enumerate(samples), total=len(samples), desc="Sample")
+        )
+
+        support = support.join(pd.DataFrame(counts, columns=[sample.name for sample in samples]))
         support.index = bed_to_index(support)
         support.to_csv(
             os.path.join(self.results_dir, self.name + ".binary_overlap_support.csv"), index=True,
         )
 
         # divide sum (of unique overlaps) by total to get support value between 0 and 1
-        support.loc[:, "support"] = support[[sample.name for sample in samples]].apply(
-            lambda x: sum([i if i <= 1 else 1 for i in x]) / float(len(samples)), axis=1
-        )
+        np.minimum(counts, 1, out=counts)
+        support.loc[:, "support"] = counts.sum(axis=1) / float(len(samples))
         # save
         support.to_csv(os.path.join(self.results_dir, self.name + ".support.csv"), index=True)
 
@@ -698,19 +689,25 @@ class ATACSeqAnalysis(Analysis):
             # Count reads with pysam
             # make strings with intervals
             sites_str = to_bed_index(sites)
-            # count, create dataframe
-            matrix_raw = pd.DataFrame(
-                map(
-                    pd.Series,
-                    parmap.map(
-                        count_reads_in_intervals,
-                        [sample.aligned_filtered_bam for sample in samples],
-                        sites_str,
-                        pm_parallel=True,
-                    ),
-                ),
-                index=[sample.name for sample in samples],
-            ).T
+            # count
+            counts = parmap.map(
+                count_reads_in_intervals,
+                [sample.aligned_filtered_bam for sample in samples],
+                sites_str,
+                pm_parallel=True,
+            )
+            names = [sample.name for sample in samples]
+            if all(len(c) == len(sites_str) for c in counts):
+                # all regions were counted, in the order of sites:
+                # fill the (n_sites, m_samples) matrix column by column
+                values = np.empty((len(sites_str), len(samples)), dtype=np.int32)
+                for i, c in enumerate(counts):
+                    values[:, i] = np.fromiter(c.values(), dtype=np.int32, count=len(sites_str))
+                matrix_raw = pd.DataFrame(values, index=sites_str, columns=names)
+            else:
+                # align each sample's counts to the order of sites,
+                # regions which could not be counted are NaN
+                matrix_raw = pd.DataFrame(dict(zip(names, counts)), index=sites_str)
 
             if assign:
                 self.matrix_raw = matrix_raw
@@ -821,7 +818,7 @@ class ATACSeqAnalysis(Analysis):
         :class:`pandas.DataFrame`
             Pandas DataFrame with read counts of shape (n_sites, m_samples).
         """
-        from tqdm import tqdm
+        from joblib import Parallel, delayed
 
         from ngs_toolkit.utils import bed_to_index
 
@@ -844,16 +841,20 @@ class ATACSeqAnalysis(Analysis):
             "_coverage", permissive=permissive, samples=samples
         )
 
-        # Read in counts
-        matrix_raw = list()
-        for sample in tqdm(samples, total=len(samples)):
-            cov = pd.read_csv(
+        def read_coverage(sample):
+            return pd.read_csv(
                 sample._coverage,
                 sep="\t",
                 header=None,
                 names=["chrom", "start", "end", sample.name],
             )
 
+        # Read in counts, one file per thread
+        covs = Parallel(n_jobs=-1, prefer="threads")(
+            delayed(read_coverage)(sample) for sample in samples
+        )
+        matrix_raw = list()
+        for sample, cov in zip(samples, covs):
             if cov.empty:
                 msg = "Coverage file for sample '{}' is empty!".format(sample.name)
                 if not permissive:
@@ -879,7 +880,7 @@ class ATACSeqAnalysis(Analysis):
             matrix_raw = (
                 matrix_raw.loc[:, ~matrix_raw.columns.duplicated()]
                 .set_index(["chrom", "start", "end"])
-                .astype(int)
+                .astype(np.int32)
             )
         else:
             matrix_raw = (
@@ -891,7 +892,7 @@ class ATACSeqAnalysis(Analysis):
                     values="value",
                     fill_value=0,
                 )
-                .astype(int)
+                .astype(np.int32)
             )
         matrix_raw.index = bed_to_index(matrix_raw.index.to_frame())
 
@@ -935,6 +936,7 @@ class ATACSeqAnalysis(Analysis):
             Dataframe with length and GC-content of each feature.
         """
         import pybedtools
+        from ngs_toolkit.general import get_region_nucleotide_content
         from ngs_toolkit.utils import bed_to_index
 
         if bed_file is None:
@@ -951,10 +953,8 @@ class ATACSeqAnalysis(Analysis):
             )
             fasta_file = self.get_resources(steps=["genome"])["genome_file"]["fasta"]
 
-        nuc = sites.nucleotide_content(fi=fasta_file).to_dataframe(comment="#")[
-            ["score", "blockStarts"]
-        ]
-        nuc.columns = ["gc_content", "length"]
+        # cached on disk for the same regions and unchanged FASTA file
+        nuc = get_region_nucleotide_content(sites.fn, fasta_file)
         nuc.index = bed_to_index(sites)
 
         # get only the sites matching the coverage (not overlapping blacklist)
@@ -1084,7 +1084,11 @@ class ATACSeqAnalysis(Analysis):
             A dataframe with genes annotated for the peak set.
         """
         import pybedtools
-        from ngs_toolkit.utils import bed_to_index, get_this_file_or_timestamped
+        from ngs_toolkit.utils import (
+            bed_to_index,
+            get_this_file_or_timestamped,
+            join_unique_by_group,
+        )
 
         cols = [6, 8, -1]  # gene_name, strand, distance
 
@@ -1119,10 +1123,8 @@ class ATACSeqAnalysis(Analysis):
         ] = np.nan
 
         # aggregate annotation per peak, concatenate various genes (comma-separated)
-        gene_annotation = (
-            closest_tss_distances.groupby(["chrom", "start", "end"])
-            .aggregate(lambda x: ",".join(set([str(i) for i in x if i != "."])))
-            .reset_index()
+        gene_annotation = join_unique_by_group(
+            closest_tss_distances, ["chrom", "start", "end"], ignore="."
         )
         closest_tss_distances.index = bed_to_index(closest_tss_distances)
         gene_annotation.index = bed_to_index(gene_annotation)
@@ -1149,6 +1151,20 @@ class ATACSeqAnalysis(Analysis):
             self.gene_annotation = gene_annotation
         return gene_annotation
 
+    def _get_shuffled_background(self):
+        """
+        Get a background region set by shuffling ``sites`` in the genome
+        (keeping them in the same chromosome).
+
+        The background is computed once and shared between annotation functions
+        for as long as ``sites`` does not change.
+        """
+        cached = getattr(self, "_shuffled_background", None)
+        if cached is None or cached[0] != self.sites.fn:
+            cached = (self.sites.fn, self.sites.shuffle(genome=self.genome, chrom=True))
+            self._shuffled_background = cached
+        return cached[1]
+
     @check_has_attributes(["organism", "genome", "sites"])
     def get_peak_genomic_location(
         self, genomic_context_file=None, save=True, output_prefix="", assign=True
@@ -1196,7 +1212,11 @@ class ATACSeqAnalysis(Analysis):
         """
         import pybedtools
 
-        from ngs_toolkit.utils import bed_to_index, get_this_file_or_timestamped
+        from ngs_toolkit.utils import (
+            bed_to_index,
+            get_this_file_or_timestamped,
+            join_unique_by_group,
+        )
 
         if genomic_context_file is None:
             _LOGGER.info("Reference genomic context file was not given, will try to get it.")
@@ -1216,27 +1236,24 @@ class ATACSeqAnalysis(Analysis):
 
         # create background
         # shuffle regions in genome to create background (keep them in the same chromossome)
-        background = self.sites.shuffle(genome=self.genome, chrom=True)
+        background = self._get_shuffled_background()
 
         cols = [0, 1, 2, -1]
         for label, attr, bed in [
             ("background", "region_annotation_b", background),
             ("real", "region_annotation", self.sites),
         ]:
-            annot = (
-                bed.intersect(context, wa=True, wb=True, f=0.2).sort().to_dataframe().iloc[:, cols]
-            )
-            annot.index = bed_to_index(annot)
+            # a single intersection with all labeled context regions,
+            # sorted in memory rather than through another bedtools process
+            annot = bed.intersect(context, wa=True, wb=True, f=0.2).to_dataframe().iloc[:, cols]
             annot.columns = ["chrom", "start", "end", "genomic_region"]
+            annot = annot.sort_values(["chrom", "start"], kind="mergesort")
+            annot.index = bed_to_index(annot)
 
             # remove duplicates (there shouldn't be anyway)
             annot = annot.drop_duplicates()
             # join various annotations per peak
-            annot_comp = (
-                annot.groupby(["chrom", "start", "end"])
-                .aggregate(lambda x: ",".join(set([str(i) for i in x])))
-                .reset_index()
-            )
+            annot_comp = join_unique_by_group(annot, ["chrom", "start", "end"])
             annot_comp.index = bed_to_index(annot_comp)
             annot_comp.columns = ["chrom", "start", "end", "genomic_region"]
             # save to disk
@@ -1317,7 +1334,7 @@ class ATACSeqAnalysis(Analysis):
             or for the genome background.
         """
         import pybedtools
-        from ngs_toolkit.utils import bed_to_index
+        from ngs_toolkit.utils import bed_to_index, join_unique_by_group
 
         states = pybedtools.BedTool(chrom_state_file)
 
@@ -1326,7 +1343,7 @@ class ATACSeqAnalysis(Analysis):
 
         # create background
         # shuffle regions in genome to create background (keep them in the same chromossome)
-        background = self.sites.shuffle(genome=self.genome, chrom=True)
+        background = self._get_shuffled_background()
 
         for label, attr, bed in [
             ("real", "chrom_state_annotation", self.sites),
@@ -1347,11 +1364,7 @@ class ATACSeqAnalysis(Analysis):
             annot.index = bed_to_index(annot)
             annot.columns = ["chrom", "start", "end", "chromatin_state"]
             # join various annotations per peak
-            annot_comp = (
-                annot.groupby(["chrom", "start", "end"])
-                .aggregate(lambda x: ",".join(set([str(i) for i in x])))
-                .reset_index()
-            )
+            annot_comp = join_unique_by_group(annot, ["chrom", "start", "end"])
             annot_comp.index = bed_to_index(annot_comp)
             annot_comp.columns = ["chrom", "start", "end", "chromatin_state"]
             # save to disk
@@ -1428,8 +1441,9 @@ class ATACSeqAnalysis(Analysis):
         # remove per sample mean
         matrix -= matrix.mean()
 
-        chroms = matrix.index.str.extract(r"^(.*):\d+-\d+$").iloc[:, 0].values
-        if not all([x in chroms for x in sex_chroms]):
+        # chromosome of each region, without regex matching every region name
+        chroms = matrix.index.str.rsplit(":", n=1).str[0].values
+        if not set(sex_chroms).issubset(chroms):
             msg = f"Requested sex chromosomes {', '.join(sex_chroms)} not found in matrix."
             _LOGGER.error(msg)
             raise ValueError
@@ -1555,14 +1569,17 @@ class ATACSeqAnalysis(Analysis):
             matrix2 = matrix.join(self.closest_tss_distances[["gene_name"]])
             matrix2 = matrix2.set_index("gene_name", append=True)
         else:
-            g = self.gene_annotation["gene_name"].str.split(",").apply(pd.Series).stack()
-            g.index = g.index.droplevel(1)
+            g = self.gene_annotation["gene_name"].str.split(",").explode().dropna()
             g.name = "gene_name"
             matrix2 = matrix.join(g).drop("gene_name", axis=1)
             matrix2.index = matrix.join(g).reset_index().set_index(["index", "gene_name"]).index
 
         matrix2.columns = matrix.columns
-        matrix3 = matrix2.groupby(level="gene_name").apply(reduce_func)
+        grouped = matrix2.groupby(level="gene_name")
+        if reduce_func in (np.mean, np.median):
+            matrix3 = getattr(grouped, reduce_func.__name__)(numeric_only=True)
+        else:
+            matrix3 = grouped.apply(reduce_func)
         matrix3 = matrix3.loc[:, ~matrix3.isnull().all()]
         if assign:
             self.matrix_gene = matrix3
@@ -1606,8 +1623,7 @@ class ATACSeqAnalysis(Analysis):
             dr2 = differential_results.join(self.closest_tss_distances[["gene_name"]])
             dr2 = dr2.set_index("gene_name", append=True)
         else:
-            g = self.gene_annotation["gene_name"].str.split(",").apply(pd.Series).stack()
-            g.index = g.index.droplevel(1)
+            g = self.gene_annotation["gene_name"].str.split(",").explode().dropna()
             g.name = "gene_name"
 
             dr2 = differential_results.join(g).drop("gene_name", axis=1)
@@ -1616,7 +1632,11 @@ class ATACSeqAnalysis(Analysis):
             )
 
         dr2.columns = differential_results.columns
-        dr3 = dr2.reset_index().groupby(["gene_name", "comparison_name"]).apply(reduce_func)
+        grouped = dr2.reset_index().groupby(["gene_name", "comparison_name"])
+        if reduce_func in (np.mean, np.median):
+            dr3 = getattr(grouped, reduce_func.__name__)(numeric_only=True)
+        else:
+            dr3 = grouped.apply(reduce_func)
 
         return dr3.loc[:, ~dr3.isnull().all()]
 
@@ -1634,6 +1654,11 @@ class ATACSeqAnalysis(Analysis):
 
         Provides plots with samples grouped `by_attribute` if given (a string or a list of strings).
 
+        The distributions of the feature statistics (from ``stats`` and ``support``
+        if present) are plotted as panels of a single figure,
+        "{output_prefix}.feature_statistics.distplot.svg", which replaces the previous
+        "{output_prefix}.{statistic}.distplot.svg" files.
+
         Parameters
         ----------
         samples : :obj:`list`, optional
@@ -1663,13 +1688,8 @@ class ATACSeqAnalysis(Analysis):
         import matplotlib.pyplot as plt
         import seaborn as sns
 
-        from ngs_toolkit.utils import (
-            count_bam_file_length,
-            count_lines,
-            get_total_region_area,
-            get_region_lengths,
-            get_regions_per_chromosomes,
-        )
+        from joblib import Parallel, delayed
+        from ngs_toolkit.utils import count_bam_file_length, read_bed_coordinates
         from ngs_toolkit.graphics import savefig
 
         if samples is None:
@@ -1681,8 +1701,13 @@ class ATACSeqAnalysis(Analysis):
         output_prefix = self._format_string_with_attributes(output_prefix)
 
         reads = parmap.map(count_bam_file_length, [s.aligned_filtered_bam for s in samples])
-        peaks = list(map(count_lines, [s.peaks for s in samples]))
-        open_chrom = list(map(get_total_region_area, [s.peaks for s in samples]))
+        # read each sample's peaks once and derive all peak statistics from it
+        peak_sets = Parallel(n_jobs=-1, prefer="threads")(
+            delayed(read_bed_coordinates)(s.peaks) for s in samples
+        )
+        peak_lengths = [p["end"] - p["start"] for p in peak_sets]
+        peaks = [p.shape[0] for p in peak_sets]
+        open_chrom = [int(lengths.sum()) for lengths in peak_lengths]
 
         stats = pd.DataFrame(
             [reads, peaks, open_chrom],
@@ -1786,9 +1811,8 @@ class ATACSeqAnalysis(Analysis):
             )
 
         # plot distribution of peak lengths
-        sample_peak_lengths = map(get_region_lengths, [s.peaks for s in samples])
         lengths = pd.melt(
-            pd.DataFrame(sample_peak_lengths, index=[s.name for s in samples]).T,
+            pd.DataFrame(peak_lengths, index=[s.name for s in samples]).T,
             value_name="peak_length",
             var_name="sample_name",
         ).dropna()
@@ -1857,7 +1881,7 @@ class ATACSeqAnalysis(Analysis):
         # peaks per chromosome per sample
         chroms = (
             pd.DataFrame(
-                map(get_regions_per_chromosomes, [s.peaks for s in samples]),
+                [p["chrom"].value_counts() for p in peak_sets],
                 index=[s.name for s in samples],
             )
             .fillna(0)
@@ -1889,13 +1913,10 @@ class ATACSeqAnalysis(Analysis):
 
         # Peak set across samples:
         # interval lengths
+        sites = read_bed_coordinates(self.sites.fn)
+        site_lengths = (sites["end"] - sites["start"]).values
         fig, axis = plt.subplots(1, 1, figsize=(3, 3))
-        sns.distplot(
-            [interval.length for interval in self.sites if interval.length < 2000],
-            hist=False,
-            kde=True,
-            ax=axis,
-        )
+        sns.distplot(site_lengths[site_lengths < 2000], hist=False, kde=True, ax=axis)
         axis.set_xlabel("Peak width (bp)")
         axis.set_ylabel("Density")
         sns.despine(fig)
@@ -1911,15 +1932,21 @@ class ATACSeqAnalysis(Analysis):
 
         # Plot distance to nearest TSS
         if hasattr(self, "closest_tss_distances"):
+            distances = self.closest_tss_distances["distance"].dropna().values
             fig, axis = plt.subplots(2, 1, figsize=(3 * 1, 3 * 2), sharex=False, sharey=False)
-            for i, ax in enumerate(axis):
-                sns.distplot(
-                    self.closest_tss_distances["distance"],
-                    bins=1000,
-                    kde=True,
-                    hist=False if (i % 2 == 0) else True,
-                    ax=ax,
-                )
+            # fit the density only once and reuse its curve over the histogram
+            sns.distplot(distances, kde=True, hist=False, ax=axis[0])
+            line = axis[0].get_lines()[0]
+            axis[1].hist(
+                distances,
+                bins=1000,
+                density=True,
+                color=line.get_color(),
+                alpha=0.4,
+                rasterized=True,
+            )
+            axis[1].plot(*line.get_data(), color=line.get_color())
+            for ax in axis:
                 ax.set_xlabel("Distance to nearest TSS (bp)")
                 ax.set_ylabel("Density")
             axis[1].set_yscale("log")
@@ -1993,22 +2020,27 @@ class ATACSeqAnalysis(Analysis):
                 ),
             )
 
-        # distribution of count statistics
+        # distribution of count statistics, one panel per statistic in a single figure
+        distributions = list()
         if hasattr(self, "stats"):
-            for attr in self.stats.columns:
-                fig, axis = plt.subplots(1, 1, figsize=(3, 3))
-                sns.distplot(self.stats.loc[:, attr], hist=False, kde=True, ax=axis)
-                sns.despine(fig)
-                savefig(
-                    fig, os.path.join(output_dir, "{}.{}.distplot.svg".format(output_prefix, attr)),
-                )
+            distributions += [self.stats.loc[:, attr] for attr in self.stats.columns]
         if hasattr(self, "support"):
-            attr = "support"
-            fig, axis = plt.subplots(1, 1, figsize=(3, 3))
-            sns.distplot(self.support.loc[:, attr], hist=False, kde=True, ax=axis)
+            distributions.append(self.support.loc[:, "support"])
+        if distributions:
+            n_cols = min(3, len(distributions))
+            n_rows = int(np.ceil(len(distributions) / n_cols))
+            fig, axis = plt.subplots(n_rows, n_cols, figsize=(3 * n_cols, 3 * n_rows), squeeze=False)
+            axis = axis.flatten()
+            for ax, values in zip(axis, distributions):
+                sns.distplot(values, hist=False, kde=True, ax=ax)
+            for ax in axis[len(distributions):]:
+                ax.axis("off")
             sns.despine(fig)
             savefig(
-                fig, os.path.join(output_dir, "{}.{}.distplot.svg".format(output_prefix, attr)),
+                fig,
+                os.path.join(
+                    output_dir, "{}.feature_statistics.distplot.svg".format(output_prefix)
+                ),
             )
 
         # Pairwise against mean
@@ -2016,10 +2048,12 @@ class ATACSeqAnalysis(Analysis):
             stats = self.stats.copy()
             if hasattr(self, "support"):
                 stats = stats.join(self.support.loc[:, "support"])
+            positive_mean = stats["mean"].values > 0
             for attr in stats.columns:
                 if attr == "mean":
                     continue
-                p = stats[(stats["mean"] > 0) & (stats[attr] < np.percentile(stats[attr], 99) * 3)]
+                values = stats[attr].values
+                p = stats[positive_mean & (values < np.percentile(values, 99) * 3)]
                 g = sns.jointplot(p["mean"], p[attr], s=1, alpha=0.1, rasterized=True, height=3)
                 savefig(
                     g.fig,
@@ -2048,12 +2082,20 @@ class ATACSeqAnalysis(Analysis):
         if samples is None:
             samples = self.samples
 
-        if by_attribute is None:
-            cov = pd.melt(
-                np.log2(1 + self.matrix_raw[[s.name for s in samples]]),
-                var_name="Sample name",
-                value_name="Raw counts (log2)",
+        def log_counts(names):
+            # long format built directly from the array, with sample names as categorical
+            values = np.log2(1 + self.matrix_raw[names].values.astype(np.float32))
+            return pd.DataFrame(
+                {
+                    "Sample name": pd.Categorical.from_codes(
+                        np.repeat(np.arange(len(names)), values.shape[0]), categories=names
+                    ),
+                    "Raw counts (log2)": values.T.reshape(-1),
+                }
             )
+
+        if by_attribute is None:
+            cov = log_counts([s.name for s in samples])
             fig, axis = plt.subplots(1, 1, figsize=(6, 1 * 4))
             sns.violinplot(
                 "Raw counts (log2)",
@@ -2070,16 +2112,7 @@ class ATACSeqAnalysis(Analysis):
             fig, axis = plt.subplots(len(attrs), 1, figsize=(8, len(attrs) * 6))
             for i, attr in enumerate(attrs):
                 _LOGGER.info(attr)
-                cov = pd.melt(
-                    np.log2(
-                        1
-                        + self.matrix_raw[
-                            [s.name for s in samples if getattr(s, by_attribute) == attr]
-                        ]
-                    ),
-                    var_name="Sample name",
-                    value_name="Raw counts (log2)",
-                )
+                cov = log_counts([s.name for s in samples if getattr(s, by_attribute) == attr])
                 sns.violinplot(
                     "Raw counts (log2)",
                     "Sample name",
@@ -2106,20 +2139,18 @@ class ATACSeqAnalysis(Analysis):
         # TODO: add plots for overal genome
         # TODO: add raw counts too
 
-        data = self.matrix_norm.copy()
+        data = self.matrix_norm
         # (rewrite to avoid putting them there in the first place)
         variables = ["gene_name", "genomic_region", "chromatin_state"]
 
+        # combine the separated comma-delimited fields of each variable in a narrow frame,
+        # keeping the index of the original row, and join it to the wide matrix only once
+        annotation = pd.DataFrame(index=data.index)
         for variable in variables:
-            d = (
-                data[variable].str.split(",").apply(pd.Series).stack()
-            )  # separate comma-delimited fields
-            d.index = d.index.droplevel(
-                1
-            )  # returned a multiindex Series, so get rid of second index level (first is from original row)
-            data = data.drop([variable], axis=1)  # drop original column so there are no conflicts
+            d = data[variable].str.split(",").explode().dropna()
             d.name = variable
-            data = data.join(d)  # joins on index
+            annotation = annotation.join(d)  # joins on index
+        data = data.drop(variables, axis=1).join(annotation)
 
         variables = [
             "chrom",
@@ -2140,7 +2171,15 @@ class ATACSeqAnalysis(Analysis):
             "chromatin_state",
         ]
         # Plot
-        data_melted = pd.melt(data, id_vars=variables, var_name="sample", value_name="norm_counts")
+        # melt once, carrying along only the feature annotations used in the plots
+        # (the long format has one row per feature and sample)
+        plotted = ["support", "mean", "dispersion", "qv2", "genomic_region", "chromatin_state"]
+        data_melted = pd.melt(
+            data.drop([v for v in variables if v not in plotted], axis=1, errors="ignore"),
+            id_vars=plotted,
+            var_name="sample",
+            value_name="norm_counts",
+        )
 
         # transform dispersion
         data_melted["dispersion"] = np.log2(1 + data_melted["dispersion"])
@@ -2154,6 +2193,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         # dispersion
         fig, axis = plt.subplots(1)
@@ -2165,6 +2205,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         # dispersion
         fig, axis = plt.subplots(1)
@@ -2175,6 +2216,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         fig, axis = plt.subplots(1)
         sns.violinplot("chromatin_state", "norm_counts", data=data_melted, ax=axis)
@@ -2184,6 +2226,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         fig, axis = plt.subplots(1)
         sns.violinplot("chromatin_state", "dispersion", data=data_melted, ax=axis)
@@ -2194,6 +2237,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         fig, axis = plt.subplots(1)
         sns.violinplot("chromatin_state", "qv2", data=data_melted, ax=axis)
@@ -2203,6 +2247,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         # separated by variable in one grid
         g = sns.FacetGrid(data_melted, col="genomic_region", col_wrap=3)
@@ -2213,6 +2258,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="genomic_region", col_wrap=3)
         g.map(sns.distplot, "dispersion", hist=False, rug=False)
@@ -2223,6 +2269,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="genomic_region", col_wrap=3)
         g.map(sns.distplot, "qv2", hist=False, rug=False)
@@ -2232,6 +2279,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="genomic_region", col_wrap=3)
         g.map(sns.distplot, "support", hist=False, rug=False)
@@ -2242,6 +2290,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="chromatin_state", col_wrap=3)
         g.map(sns.distplot, "mean", hist=False, rug=False)
@@ -2251,6 +2300,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="chromatin_state", col_wrap=3)
         g.map(sns.distplot, "dispersion", hist=False, rug=False)
@@ -2261,6 +2311,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="chromatin_state", col_wrap=3)
         g.map(sns.distplot, "qv2", hist=False, rug=False)
@@ -2270,6 +2321,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(g.fig)
 
         g = sns.FacetGrid(data_melted, col="chromatin_state", col_wrap=3)
         g.map(sns.distplot, "support", hist=False, rug=False)
@@ -2279,7 +2331,7 @@ class ATACSeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
-        plt.close("all")
+        plt.close(g.fig)
 
     def region_context_enrichment(
         self,
@@ -2402,11 +2454,15 @@ class ATACSeqAnalysis(Analysis):
                 res["foreground_fraction"] / res["universe_fraction"]
             )
             # Calculate overlap p-value:
+            # (counts of regions outside the foreground are the same for every feature)
+            rest = annot.loc[~annot.index.isin(regions), step].value_counts()
+            foreground_total = res["foreground"].sum()
+            rest_total = rest.sum()
             for feature in res["foreground"].index:
                 a = res.loc[feature, "foreground"]
-                b = res.loc[:, "foreground"].drop(feature).sum()
-                c = annot.loc[(~annot.index.isin(regions)), step].value_counts()[feature]
-                d = annot.loc[(~annot.index.isin(regions)), step].value_counts().drop(feature).sum()
+                b = foreground_total - a
+                c = rest.get(feature, 0)
+                d = rest_total - c
                 res.loc[feature, "odds_ratio"], res.loc[feature, "p_value"] = fisher_exact(
                     [[a, c], [b, d]], alternative="two-sided"
                 )
@@ -2514,9 +2570,7 @@ class ATACSeqAnalysis(Analysis):
         bed.reset_index().to_csv(tsv_file, sep="\t", header=False, index=False)
 
         # export gene names
-        clean_gene = (
-            differential["gene_name"].str.split(",").apply(pd.Series, 1).stack().drop_duplicates()
-        )
+        clean_gene = differential["gene_name"].str.split(",").explode().dropna().drop_duplicates()
         clean_gene = clean_gene[~clean_gene.isin([".", "nan", ""])]
         clean_gene.to_csv(
             os.path.join(output_dir, "{}.gene_symbols.txt".format(prefix)),
@@ -2526,11 +2580,7 @@ class ATACSeqAnalysis(Analysis):
         if "ensembl_gene_id" in differential.columns:
             # export ensembl gene names
             clean = (
-                differential["ensembl_gene_id"]
-                .str.split(",")
-                .apply(pd.Series, 1)
-                .stack()
-                .drop_duplicates()
+                differential["ensembl_gene_id"].str.split(",").explode().dropna().drop_duplicates()
             )
             clean.to_csv(
                 os.path.join(output_dir, "{}_genes.ensembl.txt".format(prefix)),
@@ -2546,8 +2596,7 @@ class ATACSeqAnalysis(Analysis):
             d = differential[["gene_name", "score"]].sort_values("score", ascending=False)
 
             # split gene names from score if a reg.element was assigned to more than one gene
-            a = d["gene_name"].str.split(",").apply(pd.Series, 1).stack()
-            a.index = a.index.droplevel(1)
+            a = d["gene_name"].str.split(",").explode().dropna()
             a.name = "gene_name"
             d = d[["score"]].join(a)
             # reduce various ranks to mean per gene
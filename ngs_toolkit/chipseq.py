@@ -452,7 +452,8 @@ class ChIPSeqAnalysis(ATACSeqAnalysis):
                         peak_counts.append([name, peak_caller, 0.0])
                     file = file.replace("narrowPeak", "bed")
                 try:
-                    df = pd.read_csv(file, sep="\t")
+                    # only the number of peaks is needed, so parse a single column
+                    df = pd.read_csv(file, sep="\t", usecols=[0])
                 except IOError:
                     if permissive:
                         _LOGGER.warning(error, (name, peak_caller))
@@ -6,4 +6,4 @@ A module providing functions to generate Analysis, Projects and their data.
 
 from ngs_toolkit.demo.data_generator import (
     generate_count_matrix, generate_data,
-    generate_project, generate_projects)
+    generate_project, generate_projects, set_seed)
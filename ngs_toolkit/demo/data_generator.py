@@ -2,16 +2,21 @@
 
 """
 A module dedicated to the generation of Analysis, Projects and their data.
+
+Random data is drawn from a module-level :class:`numpy.random.Generator`,
+so :func:`numpy.random.seed` has no effect on it.
+Use :func:`ngs_toolkit.demo.data_generator.set_seed` to generate reproducible data.
 """
 
 import os
 import string
 import tempfile
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
+import patsy
 import pybedtools
-import yaml
 
 from ngs_toolkit.general import query_biomart
 from ngs_toolkit.utils import location_index_to_bed
@@ -23,6 +28,33 @@ REGION_BASED_DATA_TYPES = [
     "ChIP-seq",
 ]  # CNV technically is too but it does not need a `sites` attr
 DEFAULT_CNV_RESOLUTIONS = ["1000kb", "100kb", "10kb"]
+_CHROMSIZES_CACHE = dict()
+_CHROMSIZES_DIR = None
+_SEED_SEQUENCE = np.random.SeedSequence()
+_RNG = np.random.default_rng(_SEED_SEQUENCE)
+
+
+def set_seed(seed=None):
+    """
+    Seed the random number generator used to generate data.
+
+    This replaces calling :func:`numpy.random.seed` before generating data,
+    which no longer affects the demo data generator.
+    Calling ``set_seed(0)`` before e.g. :func:`generate_project` makes its output reproducible.
+
+    Parameters
+    ----------
+    seed : {:obj:`int`, :class:`numpy.random.SeedSequence`}, optional
+        Seed for the random number generator.
+
+        Defaults to :obj:`None` (fresh entropy from the operating system).
+    """
+    global _SEED_SEQUENCE, _RNG
+
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    _SEED_SEQUENCE = seed
+    _RNG = np.random.default_rng(seed)
 
 
 def generate_count_matrix(
@@ -35,54 +67,49 @@ def generate_count_matrix(
     size_factors=None,
     size_factors_std=0.1,
     dispersion_function=None,
+    dtype=np.int32,
 ):
     """
     Generate count matrix for groups of samples by sampling from a
     negative binomial distribution.
-    """
-    import patsy
 
+    Counts are returned with type ``dtype`` (32-bit integers by default).
+    """
     if isinstance(coefficient_stds, (int, float)):
         coefficient_stds = [coefficient_stds] * n_factors
 
     if dispersion_function is None:
         dispersion_function = _disp
 
-    # Build sample vs factors table
-    dcat = pd.DataFrame(patsy.demo_data(*(list(string.ascii_lowercase[:n_factors]))))
-    dcat.columns = dcat.columns.str.upper()
-    for col in dcat.columns:
-        dcat[col] = dcat[col].str.upper()
-    if n_replicates > 1:
-        dcat = (
-            pd.concat([dcat for _ in range(int(np.ceil(n_replicates / 2)))])
-            .sort_values(dcat.columns.tolist())
-            .reset_index(drop=True)
-        )
-    dcat.index = ["S{}_{}".format(str(i + 1).zfill(2), dcat.loc[i, :].sum()) for i in dcat.index]
+    # Build sample vs factors table and model design table
+    dcat, design = _build_design(n_factors, n_replicates)
+    dcat = dcat.copy()
     m_samples = dcat.shape[0]
 
-    # make model design table
-    design = np.asarray(
-        patsy.dmatrix("~ 1 + " + " + ".join(string.ascii_uppercase[:n_factors]), dcat)
-    )
-
     # get means
     beta = np.asarray(
-        [np.random.normal(intercept_mean, intercept_std, n_features)]
-        + [np.random.normal(0, std, n_features) for std in coefficient_stds]
+        [_RNG.normal(intercept_mean, intercept_std, n_features)]
+        + [_RNG.normal(0, std, n_features) for std in coefficient_stds]
     ).T
 
     if size_factors is None:
-        size_factors = np.random.normal(1, size_factors_std, (m_samples, 1))
+        size_factors = _RNG.normal(1, size_factors_std, (m_samples, 1))
 
-    mean = (2 ** (design @ beta.T) * size_factors).T
+    # compute means directly in (features, samples) layout, in place
+    mean = np.empty((n_features, m_samples), dtype=np.float64)
+    np.matmul(beta, design.T, out=mean)
+    np.exp2(mean, out=mean)
+    np.multiply(mean, np.asarray(size_factors).reshape(1, -1), out=mean)
 
     # now sample counts
-    dispersion = (1 / dispersion_function(2 ** (beta[:, 1:]))).mean(1).reshape(-1, 1)
-    dnum = pd.DataFrame(
-        np.random.negative_binomial(n=mean, p=dispersion, size=mean.shape), columns=dcat.index
+    pow2_beta = np.exp2(beta[:, 1:])
+    dispersion = np.broadcast_to(
+        (1.0 / dispersion_function(pow2_beta)).mean(axis=1, keepdims=True), mean.shape
     )
+    # NB(n, p) as a Gamma-Poisson mixture: Poisson(Gamma(n, (1 - p) / p))
+    rate = _RNG.gamma(shape=mean, scale=(1 - dispersion) / dispersion)
+    counts = _RNG.poisson(rate).astype(dtype, copy=False)
+    dnum = pd.DataFrame(counts, columns=dcat.index)
     dcat.index.name = dnum.columns.name = "sample_name"
     return dnum, dcat
 
@@ -184,6 +211,7 @@ def generate_project(
     only_metadata=False,
     sample_input_files=False,
     initialize=True,
+    n_jobs=1,
     **kwargs
 ):
     """
@@ -229,6 +257,11 @@ def generate_project(
         configuration file.
 
         Default is :obj:`True`.
+    n_jobs : :obj:`int`, optional
+        Number of processes used to generate sample input files in parallel.
+        Pass -1 to use all available cores.
+
+        Default is 1 (serial).
     **kwargs : :obj:`dict`
         Additional keyword arguments will be passed to
         :func:`ngs_toolkit.demo.data_generator.generate_data`.
@@ -244,12 +277,16 @@ def generate_project(
     if output_dir is None:
         output_dir = tempfile.mkdtemp()
 
-    # Create project with projectmanager
+    # Create project with projectmanager,
+    # with sample_attributes and group_attributes depending on the number of factors
+    factors = list(string.ascii_uppercase[:n_factors])
     init_proj(
         project_name,
         genome_assemblies={organism: genome_assembly},
         overwrite=True,
         root_projects_dir=output_dir,
+        sample_attributes=["sample_name"] + factors,
+        group_attributes=factors,
     )
 
     # Generate random data
@@ -266,34 +303,25 @@ def generate_project(
 
     # Make comparison table
     comp_table_file = os.path.join(output_dir, project_name, "metadata", "comparison_table.csv")
-    ct = pd.DataFrame()
-    factors = list(string.ascii_uppercase[:n_factors])
+    ct_parts = list()
     for factor in factors:
         for side, f in [(1, "2"), (0, "1")]:
             ct2 = dcat.query("{} == '{}'".format(factor, factor + f)).index.to_frame()
             ct2["comparison_side"] = side
             ct2["comparison_name"] = "Factor_" + factor + "_" + "2vs1"
             ct2["sample_group"] = "Factor_" + factor + f
-            ct = ct.append(ct2)
-    ct["comparison_type"] = "differential"
-    ct["data_type"] = data_type
-    ct["comparison_genome"] = genome_assembly
+            ct_parts.append(ct2)
+    ct = pd.concat(ct_parts, ignore_index=True).assign(
+        comparison_type="differential", data_type=data_type, comparison_genome=genome_assembly
+    )
     ct.to_csv(comp_table_file, index=False)
 
-    # add the sample_attributes and group_attributes depending on the number of factors
     config_file = os.path.join(output_dir, project_name, "metadata", "project_config.yaml")
-    config = yaml.safe_load(open(config_file, "r"))
-    factors = list(string.ascii_uppercase[:n_factors])
-    config["sample_attributes"] = ["sample_name"] + factors
-    config["group_attributes"] = factors
-    config["comparison_table"] = comp_table_file
-    yaml.safe_dump(config, open(config_file, "w"))
 
     # prepare dirs
     dirs = [os.path.join(output_dir, project_name, "results")]
     for d in dirs:
-        if not os.path.exists(d):
-            os.makedirs(d)
+        os.makedirs(d, exist_ok=True)
 
     if not only_metadata:
         # Add consensus region set
@@ -306,18 +334,20 @@ def generate_project(
                 header=False,
             )
         if isinstance(dnum, pd.DataFrame):
-            dnum.to_csv(
-                os.path.join(output_dir, project_name, "results", project_name + ".matrix_raw.csv")
+            _write_matrix(
+                dnum,
+                os.path.join(output_dir, project_name, "results", project_name + ".matrix_raw.csv"),
             )
         elif isinstance(dnum, dict):
             for res, d in dnum.items():
-                d.to_csv(
+                _write_matrix(
+                    d,
                     os.path.join(
                         output_dir,
                         project_name,
                         "results",
                         project_name + "." + res + ".matrix_raw.csv",
-                    )
+                    ),
                 )
 
     # Here we are raising the logger level to omit messages during
@@ -331,7 +361,7 @@ def generate_project(
     an = initialize_analysis_of_data_type(data_type, config_file)
     an.load_data(permissive=True)
     if sample_input_files:
-        generate_sample_input_files(an, dnum)
+        generate_sample_input_files(an, dnum, n_jobs=n_jobs)
     # if DEV:
     _LOGGER.setLevel(prev_level)
     # _LOGGER.debug("Reactivated logger")
@@ -349,43 +379,61 @@ def generate_projects(
     n_factors=[1, 2, 5],
     n_features=[100, 1000, 10000],
     n_replicates=[1, 3, 5],
+    n_jobs=1,
     **kwargs
 ):
     """
     Create a list of Projects given ranges of parameters, which will be passed
     to :func:`ngs_toolkit.demo.data_generator.generate_project`.
+
+    Parameters
+    ----------
+    n_jobs : :obj:`int`, optional
+        Number of processes used to generate projects in parallel.
+        Pass -1 to use all available cores.
+        Only projects are parallelized: sample input files of each project
+        are generated serially within its worker.
+
+        Defaults to 1 (serial).
     """
-    ans = list()
-    for data_type in data_types:
-        for organism, genome_assembly in zip(organisms, genome_assemblies):
-            for factors in n_factors:
-                for features in n_features:
-                    for replicates in n_replicates:
-                        project_name = "_".join(
-                            str(x)
-                            for x in [
-                                project_prefix_name,
-                                data_type,
-                                genome_assembly,
-                                factors,
-                                features,
-                                replicates,
-                            ]
-                        )
-
-                        an = generate_project(
-                            output_dir=output_path,
-                            project_name=project_name,
-                            organism=organism,
-                            genome_assembly=genome_assembly,
-                            data_type=data_type,
-                            n_factors=factors,
-                            n_replicates=replicates,
-                            n_features=features,
-                            **kwargs
-                        )
-                        ans.append(an)
-    return ans
+    import itertools
+
+    from joblib import Parallel, delayed
+
+    grid = list()
+    for data_type, (organism, genome_assembly), factors, features, replicates in itertools.product(
+        data_types, zip(organisms, genome_assemblies), n_factors, n_features, n_replicates
+    ):
+        project_name = "_".join(
+            str(x)
+            for x in [
+                project_prefix_name,
+                data_type,
+                genome_assembly,
+                factors,
+                features,
+                replicates,
+            ]
+        )
+        grid.append(
+            dict(
+                output_dir=output_path,
+                project_name=project_name,
+                organism=organism,
+                genome_assembly=genome_assembly,
+                data_type=data_type,
+                n_factors=factors,
+                n_replicates=replicates,
+                n_features=features,
+                **kwargs
+            )
+        )
+
+    # give each job an independent random stream
+    seeds = _SEED_SEQUENCE.spawn(len(grid))
+    return Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(_seeded)(generate_project, seed, n_jobs=1, **kw) for seed, kw in zip(seeds, grid)
+    )
 
 
 def generate_bam_file(
@@ -395,22 +443,23 @@ def generate_bam_file(
     s = location_index_to_bed(count_vector.index)
 
     # get reads per region
-    i = [i for i, c in count_vector.iteritems() for _ in range(c)]
-    s = s.reindex(i)
+    counts = count_vector.values.astype(np.int64)
+    positions = np.repeat(np.arange(len(count_vector), dtype=np.int64), counts)
+    s = s.iloc[positions].reset_index(drop=True)
 
     # shorten/enlarge by a random fraction; name reads
-    d = s["end"] - s["start"]
+    d = (s["end"] - s["start"]).values
+    jitter = _RNG.uniform(-0.2, 0.2, (s.shape[0], 2))
     s = s.assign(
-        start=(s["start"] + d * np.random.uniform(-0.2, 0.2, s.shape[0])).astype(int),
-        end=(s["end"] + d * np.random.uniform(-0.2, 0.2, s.shape[0])).astype(int),
+        start=(s["start"].values + d * jitter[:, 0]).astype(int),
+        end=(s["end"].values + d * jitter[:, 1]).astype(int),
         name=["{}_read_{}".format(count_vector.name, i) for i in range(s.shape[0])],
     )
 
     s = pybedtools.BedTool.from_dataframe(s).truncate_to_chrom(genome=genome_assembly).sort()
     # get a file with chromosome sizes (usually not needed but only for bedToBam)
     if chrom_sizes_file is None:
-        chrom_sizes_file = tempfile.NamedTemporaryFile().name
-        pybedtools.get_chromsizes_from_ucsc(genome=genome_assembly, saveas=chrom_sizes_file)
+        chrom_sizes_file = _get_chromsizes_file(genome_assembly)
     s.to_bam(g=chrom_sizes_file).saveas(output_bam)
 
     if index:
@@ -427,29 +476,25 @@ def generate_peak_file(peak_set, output_peak, genome_assembly="hg38", summits=Fa
     s = peak_set.to_dataframe()
 
     # choose a random but non-empty fraction of sites to keep
-    while True:
-        s2 = s.sample(frac=np.random.uniform())
-        if not s2.empty:
-            break
-    s = pybedtools.BedTool.from_dataframe(s2)
-    # shorten/enlarge sites by a random fraction
-    s = s.slop(
-        l=np.random.uniform(-0.2, 0.2),
-        r=np.random.uniform(-0.2, 0.2),
-        pct=True,
-        genome=genome_assembly,
+    s = s.sample(
+        frac=_RNG.uniform(1.0 / s.shape[0], 1.0), random_state=int(_RNG.integers(2 ** 32 - 1))
+    )
+
+    # shorten/enlarge sites by a random fraction, respecting chromosome bounds
+    csizes = {k: v[-1] for k, v in dict(pybedtools.chromsizes(genome_assembly)).items()}
+    w = s["end"] - s["start"]
+    s["start"] = (s["start"] - (w * _RNG.uniform(-0.2, 0.2)).astype(int)).clip(lower=0)
+    s["end"] = np.minimum(
+        s["end"] + (w * _RNG.uniform(-0.2, 0.2)).astype(int), s["chrom"].map(csizes)
     )
 
     if summits:
         # get middle basepair
-        s = s.to_dataframe()
         mid = ((s["end"] - s["start"]) / 2).astype(int)
-        s.loc[:, "start"] += mid
-        s.loc[:, "end"] -= mid
-        s = pybedtools.BedTool.from_dataframe(s)
+        s["start"] += mid
+        s["end"] -= mid
 
-    s = s.sort()
-    s.saveas(output_peak)
+    pybedtools.BedTool.from_dataframe(s).sort().saveas(output_peak)
 
 
 def generate_log2_profiles(sample_vector, background_vector, output_file):
@@ -466,54 +511,87 @@ def generate_log2_profiles(sample_vector, background_vector, output_file):
         s.to_csv(handle, sep="\t")
 
 
-def generate_sample_input_files(analysis, matrix):
-    """Generate input files (BAM, peaks) for a sample depending on its data type."""
+def generate_sample_input_files(analysis, matrix, n_jobs=1):
+    """
+    Generate input files (BAM, peaks) for a sample depending on its data type.
+
+    Samples are processed in parallel with up to ``n_jobs`` processes
+    (default 1, serial).
+    """
+    from joblib import Parallel, delayed
+
+    chrom_sizes_file = None
+    sites = None
     if analysis.data_type in REGION_BASED_DATA_TYPES:
-        chrom_sizes_file = tempfile.NamedTemporaryFile().name
-        pybedtools.get_chromsizes_from_ucsc(genome=analysis.genome, saveas=chrom_sizes_file)
+        chrom_sizes_file = _get_chromsizes_file(analysis.genome)
 
         if not hasattr(analysis, "sites"):
             analysis.load_data(only_these_keys=["sites"], permissive=True)
         if not hasattr(analysis, "sites"):
             raise AttributeError("Need a consensus peak set to generate sample input files.")
+        sites = analysis.sites.fn
 
+    # create all output directories upfront
+    dirs = set()
     for sample in analysis.samples:
-        if hasattr(sample, "aligned_filtered_bam"):
-            if sample.aligned_filtered_bam is not None:
-                d = os.path.dirname(sample.aligned_filtered_bam)
-                os.makedirs(d, exist_ok=True)
-                generate_bam_file(
-                    matrix.loc[:, sample.name],
-                    sample.aligned_filtered_bam,
-                    genome_assembly=analysis.genome,
-                    chrom_sizes_file=chrom_sizes_file,
-                )
-        if hasattr(sample, "peaks"):
-            if sample.peaks is not None:
-                d = os.path.dirname(sample.peaks)
-                os.makedirs(d, exist_ok=True)
-                generate_peak_file(
-                    analysis.sites, sample.peaks, summits=False, genome_assembly=analysis.genome
-                )
-        if hasattr(sample, "summits"):
-            if sample.summits is not None:
-                d = os.path.dirname(sample.summits)
-                os.makedirs(d, exist_ok=True)
-                generate_peak_file(
-                    analysis.sites, sample.summits, summits=True, genome_assembly=analysis.genome
-                )
+        for attr in ["aligned_filtered_bam", "peaks", "summits"]:
+            file = getattr(sample, attr, None)
+            if file is not None:
+                dirs.add(os.path.dirname(file))
+        if getattr(sample, "log2_read_counts", None) is not None:
+            dirs.update(os.path.dirname(file) for file in sample.log2_read_counts.values())
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+
+    tasks = list()
+    for sample in analysis.samples:
+        files = {
+            attr: getattr(sample, attr, None)
+            for attr in ["aligned_filtered_bam", "peaks", "summits", "log2_read_counts"]
+        }
+        if isinstance(matrix, dict):
+            counts = {res: m.loc[:, sample.name] for res, m in matrix.items()}
+        else:
+            counts = matrix.loc[:, sample.name]
+        tasks.append((files, counts))
+
+    # give each job an independent random stream
+    seeds = _SEED_SEQUENCE.spawn(len(tasks))
+    Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(_seeded)(
+            _generate_sample_input_files,
+            seed,
+            files,
+            counts,
+            sites,
+            analysis.genome,
+            chrom_sizes_file,
+        )
+        for seed, (files, counts) in zip(seeds, tasks)
+    )
+
 
-        if hasattr(sample, "log2_read_counts"):
-            if sample.log2_read_counts is not None:
-                for res, file in sample.log2_read_counts.items():
-                    os.makedirs(os.path.dirname(file), exist_ok=True)
-                    generate_log2_profiles(
-                        (2 ** matrix[res].loc[:, sample.name]).astype(int),
-                        (2 ** matrix[res].loc[:, sample.name]).astype(
-                            int
-                        ),  # this should be the background vector
-                        file,
-                    )
+def _generate_sample_input_files(files, counts, sites, genome_assembly, chrom_sizes_file):
+    """Generate the input files of a single sample given its file paths and counts."""
+    if files["aligned_filtered_bam"] is not None:
+        generate_bam_file(
+            counts,
+            files["aligned_filtered_bam"],
+            genome_assembly=genome_assembly,
+            chrom_sizes_file=chrom_sizes_file,
+        )
+    if files["peaks"] is not None:
+        generate_peak_file(sites, files["peaks"], summits=False, genome_assembly=genome_assembly)
+    if files["summits"] is not None:
+        generate_peak_file(sites, files["summits"], summits=True, genome_assembly=genome_assembly)
+
+    if files["log2_read_counts"] is not None:
+        for res, file in files["log2_read_counts"].items():
+            generate_log2_profiles(
+                (2 ** counts[res]).astype(int),
+                (2 ** counts[res]).astype(int),  # this should be the background vector
+                file,
+            )
 
 
 def initialize_analysis_of_data_type(data_type, pep_config, *args, **kwargs):
@@ -539,16 +617,20 @@ def get_random_genomic_locations(
     }
     gsize = sum(csizes.values())
     csizes = {k: v / gsize for k, v in csizes.items()}
-    chrom = pd.Series(
-        np.random.choice(a=list(csizes.keys()), size=n_regions, p=list(csizes.values()))
-    )
-    start = np.array([0] * n_regions)
-    end = np.absolute(np.random.normal(width_mean, width_std, n_regions)).astype(int)
-    df = pd.DataFrame([chrom.tolist(), start.tolist(), end.tolist()]).T
-    df.loc[(df[2] - df[1]) < min_width, 2] += min_width
+    chrom = _RNG.choice(a=list(csizes.keys()), size=n_regions, p=list(csizes.values()))
+    start = np.zeros(n_regions, dtype=np.int64)
+    end = np.absolute(_RNG.normal(width_mean, width_std, n_regions)).astype(np.int64)
+    end = np.where(end - start < min_width, end + min_width, end)
+    df = pd.DataFrame({0: chrom, 1: start, 2: end})
     bed = (
         pybedtools.BedTool.from_dataframe(df)
-        .shuffle(genome=genome_assembly, chromFirst=True, noOverlapping=True, chrom=True)
+        .shuffle(
+            genome=genome_assembly,
+            chromFirst=True,
+            noOverlapping=True,
+            chrom=True,
+            seed=int(_RNG.integers(2 ** 31 - 1)),
+        )
         .sort()
         .to_dataframe()
     )
@@ -557,7 +639,20 @@ def get_random_genomic_locations(
 
 def get_random_genes(n_genes, genome_assembly="hg38"):
     """Get ``n_genes`` number of random genes from the set of genes of the ``genome_assembly``"""
+    g = pd.Series(_get_genes(genome_assembly))
+    return g.sample(
+        n=n_genes, replace=False, random_state=int(_RNG.integers(2 ** 32 - 1))
+    ).sort_values()
+
 
+@lru_cache(maxsize=None)
+def _get_genes(genome_assembly):
+    """
+    Get the unique gene names of ``genome_assembly`` from Biomart.
+
+    Kept in memory for the process lifetime on top of the
+    on-disk cache of :func:`ngs_toolkit.general.query_biomart`.
+    """
     m = {"hg19": "grch37", "hg38": "grch38", "mm10": "grcm38"}
     o = {"hg19": "hsapiens", "hg38": "hsapiens", "mm10": "mmusculus"}
 
@@ -570,7 +665,9 @@ def get_random_genes(n_genes, genome_assembly="hg38"):
         .squeeze()
         .drop_duplicates()
     )
-    return g.sample(n=n_genes, replace=False).sort_values()
+    values = g.values
+    values.flags.writeable = False
+    return values
 
 
 def get_random_grnas(n_genes, genome_assembly="hg38", n_grnas_per_gene=4):
@@ -601,5 +698,91 @@ def get_genomic_bins(n_bins, genome_assembly="hg38", resolution=None):
     return bed_to_index(w.head(n_bins))
 
 
+@lru_cache(maxsize=None)
+def _build_design(n_factors, n_replicates):
+    """
+    Build the sample vs factors table and respective model design matrix.
+
+    Results are cached by ``(n_factors, n_replicates)``,
+    so callers should copy the table before modifying it.
+    """
+    dcat = pd.DataFrame(patsy.demo_data(*(list(string.ascii_lowercase[:n_factors]))))
+    dcat = pd.DataFrame(
+        np.char.upper(dcat.values.astype(str)), columns=dcat.columns.str.upper()
+    )
+    if n_replicates > 1:
+        k = int(np.ceil(n_replicates / 2))
+        arr = np.repeat(dcat.values.astype(str), k, axis=0)
+        arr = arr[np.lexsort(arr.T[::-1])]
+        dcat = pd.DataFrame(arr, columns=dcat.columns)
+    labels = dcat.astype(str).agg("".join, axis=1).values
+    dcat.index = ["S{}_{}".format(str(i + 1).zfill(2), label) for i, label in enumerate(labels)]
+
+    design = np.asarray(
+        patsy.dmatrix("~ 1 + " + " + ".join(string.ascii_uppercase[:n_factors]), dcat)
+    )
+    design.flags.writeable = False
+    return dcat, design
+
+
+def _seeded(function, seed, *args, **kwargs):
+    """
+    Call ``function`` with the module's random number generator seeded with ``seed``.
+
+    The previous generator is restored afterwards, so calls run in the parent process
+    (e.g. with ``n_jobs=1``) do not change the caller's random state.
+    """
+    global _SEED_SEQUENCE, _RNG
+
+    previous = _SEED_SEQUENCE, _RNG
+    set_seed(seed)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _SEED_SEQUENCE, _RNG = previous
+
+
+def _write_matrix(matrix, output_file):
+    """
+    Write a matrix to a CSV file with its index as first column.
+
+    Uses the ``pyarrow`` CSV writer if available, falling back to pandas.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv
+    except ImportError:
+        matrix.to_csv(output_file)
+        return
+
+    index_name = "" if matrix.index.name is None else matrix.index.name
+    table = pa.Table.from_pandas(
+        matrix.rename_axis(index_name).reset_index(), preserve_index=False
+    )
+    pyarrow.csv.write_csv(table, output_file)
+
+
+def _get_chromsizes_file(genome_assembly):
+    """
+    Get a file with the chromosome sizes of ``genome_assembly`` from UCSC.
+
+    The file is downloaded only once per genome assembly in the process,
+    into a temporary directory that is removed when the process exits.
+    """
+    global _CHROMSIZES_DIR
+
+    if genome_assembly not in _CHROMSIZES_CACHE:
+        if _CHROMSIZES_DIR is None:
+            import atexit
+            import shutil
+
+            _CHROMSIZES_DIR = tempfile.mkdtemp(prefix="ngs_toolkit.chromsizes.")
+            atexit.register(shutil.rmtree, _CHROMSIZES_DIR, ignore_errors=True)
+        chrom_sizes_file = os.path.join(_CHROMSIZES_DIR, genome_assembly + ".chrom.sizes")
+        pybedtools.get_chromsizes_from_ucsc(genome=genome_assembly, saveas=chrom_sizes_file)
+        _CHROMSIZES_CACHE[genome_assembly] = chrom_sizes_file
+    return _CHROMSIZES_CACHE[genome_assembly]
+
+
 def _disp(x):
-    return 4 / x + 0.1
+    return 4.0 / x + 0.1
@@ -7,7 +7,7 @@ import numpy as np
 import pandas as pd
 
 from ngs_toolkit import _CONFIG, _LOGGER, MEMORY
-from ngs_toolkit.utils import get_this_file_or_timestamped
+from ngs_toolkit.utils import get_this_file_or_timestamped, read_bed_coordinates
 from ngs_toolkit.exceptions import NetworkError
 
 
@@ -1831,7 +1831,7 @@ def enrichr(gene_set, gene_set_libraries=None, kind="genes", max_attempts=5):
     import json
     import requests
 
-    from tqdm import tqdm
+    from joblib import Parallel, delayed
 
     ENRICHR_ADD = "http://amp.pharm.mssm.edu/Enrichr/addList"
     ENRICHR_RETRIEVE = "http://amp.pharm.mssm.edu/Enrichr/enrich"
@@ -1882,8 +1882,8 @@ def enrichr(gene_set, gene_set_libraries=None, kind="genes", max_attempts=5):
                 raise ValueError(msg)
 
     if kind == "genes":
-        # Build payload with bed file
-        attr = "\n".join(genes)
+        # Build payload with bed file, submitting each gene only once
+        attr = "\n".join(dict.fromkeys(genes))
     elif kind == "regions":
         raise NotImplementedError
         # Build payload with bed file
@@ -1902,12 +1902,7 @@ def enrichr(gene_set, gene_set_libraries=None, kind="genes", max_attempts=5):
     # Track gene set ID
     user_list_id = json.loads(response.text)["userListId"]
 
-    results = pd.DataFrame()
-    for gene_set_library in tqdm(
-        gene_set_libraries,
-        total=len(gene_set_libraries),
-        desc="Gene set library",
-    ):
+    def get_library_results(gene_set_library):
         _LOGGER.debug(
             "Using Enricher on {} gene set library.".format(gene_set_library)
         )
@@ -1935,14 +1930,14 @@ def enrichr(gene_set, gene_set_libraries=None, kind="genes", max_attempts=5):
 
         # Get enriched sets in gene set
         res = json.loads(response.text)
-        # If there's no enrichemnt, continue
+        # If there's no enrichemnt, skip
         if len(res) < 0:
-            continue
+            return None
 
         # Put in dataframe
         res = pd.DataFrame([pd.Series(s) for s in res[gene_set_library]])
         if res.shape[0] == 0:
-            continue
+            return None
         cols = [
             "rank",
             "description",
@@ -1959,11 +1954,18 @@ def enrichr(gene_set, gene_set_libraries=None, kind="genes", max_attempts=5):
 
         # Remember gene set library used
         res["gene_set_library"] = gene_set_library
+        return res
 
-        # Append to master dataframe
-        results = results.append(res, ignore_index=True)
+    # Requests are I/O bound, so query the libraries concurrently in threads
+    results = Parallel(n_jobs=max(1, min(8, len(gene_set_libraries))), prefer="threads")(
+        delayed(get_library_results)(gene_set_library)
+        for gene_set_library in gene_set_libraries
+    )
+    results = [res for res in results if res is not None]
 
-    return results
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
 
 
 def run_enrichment_jobs(
@@ -2018,9 +2020,13 @@ def run_enrichment_jobs(
     jobs = list()
     # list of tuples with: job_name, log, exec, requirements (partition, cpu, mem, time), cmd
 
+    # list region files once, they are shared by several steps
+    # the star here is to support timestamped files
+    region_files = glob(results_dir + "/*/*_regions*bed")
+
     # REGION
     if "region" in steps:
-        files = glob(results_dir + "/*/*_regions*bed")
+        files = region_files
         for file in files:
             dir_ = os.path.dirname(file)
             name = os.path.basename(dir_)
@@ -2041,8 +2047,7 @@ def run_enrichment_jobs(
 
     # LOLA
     if "lola" in steps:
-        # the star here is to support timestamped files
-        files = glob(results_dir + "/*/*_regions*bed")
+        files = region_files
         for file in files:
             dir_ = os.path.dirname(file)
             name = os.path.basename(dir_)
@@ -2088,7 +2093,7 @@ def run_enrichment_jobs(
 
     # HOMER
     if "homer" in steps:
-        files = glob(results_dir + "/*/*_regions*bed")
+        files = region_files
         for file in files:
             dir_ = os.path.dirname(file)
             name = os.path.basename(dir_)
@@ -2357,7 +2362,7 @@ def rename_sample_files(
 
         Defaults to "results_pipeline".
     dry_run: :obj:`bool`, optional
-        Whether to print commands instead of running them.
+        Whether to only log file renames instead of running them.
 
         Defaults to :obj:`False`.
     """
@@ -2377,11 +2382,11 @@ def rename_sample_files(
                 if not dry_run:
                     shutil.move(file, new_file)  # rename
                 else:
-                    print(file, new_file)
+                    _LOGGER.info("Would move '%s' to '%s'.", file, new_file)
                 file = new_file
             if os.path.isdir(file):
                 os.chdir(file)
-                find_replace(from_pattern, to_pattern, ".")
+                find_replace(from_pattern, to_pattern, ".", dry_run=dry_run)
                 os.chdir("..")
 
     # 1) move to tmp name
@@ -2573,6 +2578,45 @@ def query_biomart(
     return mapping.replace("", np.nan)
 
 
+def get_region_nucleotide_content(bed_file, fasta_file):
+    """
+    Get GC content and length of regions in a BED file using ``bedtools nuc``.
+
+    The output of this function is cached to disk using joblib, keyed on the
+    coordinates of the regions and on the path, modification time and size of the
+    FASTA file, so repeated calls on the same regions skip scanning the FASTA file
+    even if these are written to a new BED file each time.
+    To clear the cache please call :func:`ngs_toolkit.MEMORY.clear()`.
+
+    Parameters
+    ----------
+    bed_file : :obj:`str`
+        A 3-column BED file with regions.
+    fasta_file : :obj:`str`
+        FASTA file of the genome of the regions. Preferably indexed.
+
+    Returns
+    -------
+    :obj:`pandas.DataFrame`
+        Dataframe with "gc_content" and "length" columns in the order of regions in ``bed_file``.
+    """
+    stat = os.stat(fasta_file)
+    return _get_region_nucleotide_content(
+        read_bed_coordinates(bed_file), fasta_file, (stat.st_mtime_ns, stat.st_size)
+    )
+
+
+@MEMORY.cache
+def _get_region_nucleotide_content(regions, fasta_file, fasta_stamp):
+    import pybedtools
+
+    nuc = pybedtools.BedTool.from_dataframe(regions).nucleotide_content(
+        fi=fasta_file
+    ).to_dataframe(comment="#")[["score", "blockStarts"]]
+    nuc.columns = ["gc_content", "length"]
+    return nuc
+
+
 def subtract_principal_component(
     x,
     pc=1,
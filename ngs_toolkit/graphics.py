@@ -482,18 +482,22 @@ def plot_projection(
         axis = axis.reshape((dims, 1))
     elif (n_attr > 1) and (dims == 1):
         axis = axis.reshape((1, n_attr))
+    sample_names = df.index.get_level_values("sample_name")
     for pc in range(dims):
+        xs = df[pc].values
+        ys = df[pc + 1].values
         for i, attr in enumerate(attributes_to_plot):
 
-            # TODO: make plotting faster specially for many samples
-            for j, sample in enumerate(df.index):
-                sample = pd.Series(sample, index=df.index.names)
-                label = df.index.get_level_values(attr)[j]
+            # one scatter call per group of samples sharing a label
+            labels = df.index.get_level_values(attr)
+            colors = color_dataframe.loc[sample_names, attr].tolist()
+            for label in pd.unique(labels):
+                mask = pd.isnull(labels) if pd.isnull(label) else (labels == label)
                 axis[pc, i].scatter(
-                    df.loc[sample["sample_name"], pc],
-                    df.loc[sample["sample_name"], pc + 1],
+                    xs[mask],
+                    ys[mask],
                     s=30,
-                    color=color_dataframe.loc[sample["sample_name"], attr],
+                    color=[c for c, m in zip(colors, mask) if m],
                     alpha=0.75,
                     label=label,
                     rasterized=rasterized,
@@ -519,26 +523,19 @@ def plot_projection(
                 )  # fix for deduplicating lists
                 cd = cd.reset_index().drop_duplicates().set_index(attr).drop_duplicates()
 
-                for j, group in enumerate(df2.index):
-                    if group not in df2.index:
-                        continue
+                for group, gx, gy in zip(df2.index, df2[pc].values, df2[pc + 1].values):
+                    color = cd.loc[group].squeeze()
                     axis[pc, i].scatter(
-                        df2.loc[group, pc],
-                        df2.loc[group, pc + 1],
+                        gx,
+                        gy,
                         marker="s",
                         s=50,
-                        color=cd.loc[group].squeeze(),
+                        color=color,
                         alpha=0.95,
                         label=group,
                         rasterized=rasterized,
                     )
-                    axis[pc, i].text(
-                        df2.loc[group, pc],
-                        df2.loc[group, pc + 1],
-                        group,
-                        color=cd.loc[group].squeeze(),
-                        alpha=0.95,
-                    )
+                    axis[pc, i].text(gx, gy, group, color=color, alpha=0.95)
 
             # Graphics
             if pc == 0:
@@ -24,21 +24,20 @@ def parse_ame(ame_output):
     IOError
         If directory contain
     """
-    with open(ame_output, "r") as handle:
-        lines = handle.readlines()
-
     output = list()
-    for line in lines:
-        # skip header lines
-        if line[0] not in [str(i) for i in range(10)]:
-            continue
-
-        # get motif string and the first half of it (simple name)
-        motif = line.strip().split(" ")[5].split("_")[0]
-        # get corrected p-value
-        q_value = float(line.strip().split(" ")[-2])
-        # append
-        output.append((motif, q_value))
+    with open(ame_output, "r") as handle:
+        for line in handle:
+            # skip header lines
+            if line[0] not in "0123456789":
+                continue
+
+            fields = line.strip().split(" ")
+            # get motif string and the first half of it (simple name)
+            motif = fields[5].split("_")[0]
+            # get corrected p-value
+            q_value = float(fields[-2])
+            # append
+            output.append((motif, q_value))
 
     r = pd.Series(dict(output)).reset_index()
     r.columns = ["TF", "p_value"]
@@ -71,7 +70,7 @@ def parse_homer(homer_dir):
     if len(motif_htmls) < 1:
         raise IOError("Homer directory does not contain any discovered motifs.")
 
-    output = pd.DataFrame()
+    output = list()
     for motif_html in motif_htmls:
 
         motif = int(
@@ -108,9 +107,9 @@ def parse_homer(homer_dir):
         ]
 
         # append
-        output = output.append(info_table, ignore_index=True)
+        output.append(info_table)
 
-    return output.sort_values("motif")
+    return pd.concat(output, ignore_index=True).sort_values("motif")
 
 
 def parse_great_enrichment(input_tsv):
@@ -107,6 +107,8 @@ def create_project(
     email=None,
     url=None,
     git=True,
+    sample_attributes=None,
+    group_attributes=None,
 ):
     """
     Main function: Create project.
@@ -139,6 +141,10 @@ def create_project(
     if url is not None:
         if "{project_name}" in url:
             url = url.format(project_name=project_name)
+    if sample_attributes is None:
+        sample_attributes = ["sample_name"]
+    if group_attributes is None:
+        group_attributes = ["sample_name"]
 
     metadata_dir = os.path.join(project_dir, "metadata")
     project_config = os.path.join(metadata_dir, "project_config.yaml")
@@ -174,9 +180,9 @@ def create_project(
     subsample_table: {sample_subannotation}
     comparison_table: {comparison_table}
     sample_attributes:
-        - sample_name
+        - {sample_attributes}
     group_attributes:
-        - sample_name
+        - {group_attributes}
     sample_modifiers:
         imply:
             {genome_assemblies}
@@ -196,6 +202,8 @@ def create_project(
         sample_subannotation=sample_subannotation,
         comparison_table=comparison_table,
         genome_assemblies=genome_assemblies,
+        sample_attributes="\n        - ".join(sample_attributes),
+        group_attributes="\n        - ".join(group_attributes),
         url=url,
     )
 
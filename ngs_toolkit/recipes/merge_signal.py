@@ -178,7 +178,7 @@ def main(cli=None):
         "Using the following attributes to merge samples: '%s', "
         "resulting in a total of %i groups.",
         "', '".join(args.attributes),
-        len(sheet.groupby(args.attributes).groups.items())
+        sheet.groupby(args.attributes).ngroups
     )
 
     merge_signal(
@@ -230,9 +230,8 @@ def merge_signal(
         print(name)
         name = re.sub(r"_{2}", "_", name)
         name = re.sub(r"_$", "", name)
-        sample_subset = [
-            s for s in samples if s.name in sheet.loc[index, "sample_name"].tolist()
-        ]
+        group_samples = set(sheet.loc[index, "sample_name"])
+        sample_subset = [s for s in samples if s.name in group_samples]
         bams = [s.aligned_filtered_bam for s in sample_subset]
 
         genomes = list(set(s.genome for s in sample_subset))
@@ -468,20 +468,22 @@ class RNASeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
-        cov = pd.DataFrame()
-        for i in [1, 2, 3, 6, 12, 24, 48, 96, 200, 300, 400, 500, 1000]:
-            cov[i] = matrix_raw.apply(lambda x: sum(x >= i))
+        cov = pd.DataFrame(
+            {
+                i: (matrix_raw >= i).sum()
+                for i in [1, 2, 3, 6, 12, 24, 48, 96, 200, 300, 400, 500, 1000]
+            }
+        )
+        cov_z = cov.drop([1, 2], axis=1)
+        cov_z = (cov_z - cov_z.mean()) / cov_z.std()
 
         fig, axis = plt.subplots(1, 2, figsize=(6 * 2, 6))
         sns.heatmap(
             cov.drop([1, 2], axis=1), ax=axis[0], cmap="GnBu", cbar_kws={"label": "Genes covered"},
         )
-        sns.heatmap(
-            cov.drop([1, 2], axis=1).apply(lambda x: (x - x.mean()) / x.std(), axis=0),
-            ax=axis[1],
-            cbar_kws={"label": "Z-score"},
-        )
+        sns.heatmap(cov_z, ax=axis[1], cbar_kws={"label": "Z-score"})
         for ax in axis:
             ax.set_xticklabels(ax.get_xticklabels(), rotation=90)
             ax.set_yticklabels(ax.get_yticklabels(), rotation=0)
@@ -495,6 +497,7 @@ class RNASeqAnalysis(Analysis):
             ),
             bbox_inches="tight",
         )
+        plt.close(fig)
 
         for name, matrix in [
             ("counts", matrix_raw),
@@ -518,6 +521,7 @@ class RNASeqAnalysis(Analysis):
                 ),
                 bbox_inches="tight",
             )
+            plt.close(fig)
 
 
 def plot_features(
@@ -745,5 +749,6 @@ def assess_cell_cycle(
         dpi=300,
         bbox_inches="tight",
     )
+    plt.close(fig)
 
     return preds
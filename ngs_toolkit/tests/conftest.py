@@ -5,8 +5,14 @@ import os
 from functools import partialmethod
 
 import pytest
+import yaml
 
-from ngs_toolkit import MEMORY, _CONFIG, _LOGGER, Analysis, ATACSeqAnalysis
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+from ngs_toolkit import JOBLIB_CACHE_DIR, MEMORY, _CONFIG, _LOGGER, Analysis, ATACSeqAnalysis
 from ngs_toolkit.demo.data_generator import generate_project
 
 
@@ -47,6 +53,31 @@ except KeyError:
         _LOGGER.warning(msg)
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--runslow", action="store_true", default=False, help="Run tests marked as slow."
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: slow test, only run with --runslow")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip_slow = pytest.mark.skip(reason="Slow test, use --runslow to run it.")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
+# Directory to keep downloaded test data across sessions
+TEST_CACHE_DIR: str = os.environ.get(
+    "NGS_TOOLKIT_TEST_CACHE", os.path.join(JOBLIB_CACHE_DIR, "test_data")
+)
+
+
 # Test-specifc options
 # # Note:
 # # The DESeq2 1.24.0 version in Debian archives
@@ -107,13 +138,10 @@ def is_internet_connected(hostname="www.google.com"):
 
 
 def has_module(module):
-    import importlib
+    # Only locate the module, importing it is left to the tests that need it
+    import importlib.util
 
-    try:
-        importlib.import_module(module)
-        return True
-    except ModuleNotFoundError:
-        return False
+    return importlib.util.find_spec(module) is not None
 
 
 def has_R_library(library):
@@ -154,9 +182,33 @@ def file_not_empty(file):
 def file_exists_and_not_empty(file):
     from ngs_toolkit.utils import get_this_file_or_timestamped
 
-    f = get_this_file_or_timestamped(file)
+    try:
+        return os.stat(get_this_file_or_timestamped(file)).st_size > 0
+    except FileNotFoundError:
+        return False
+
+
+def files_exist_and_not_empty(files):
+    """
+    Check several files with a single directory scan per parent directory
+    instead of two `stat` calls per file.
+    """
+    from ngs_toolkit.utils import get_this_file_or_timestamped
+
+    sizes = dict()
+    for directory in {os.path.dirname(f) for f in files}:
+        try:
+            with os.scandir(directory) as entries:
+                sizes.update({e.path: e.stat().st_size for e in entries if e.is_file()})
+        except FileNotFoundError:
+            return False
 
-    return os.path.exists(f) and (os.stat(f).st_size > 0)
+    for f in files:
+        if f not in sizes:
+            f = get_this_file_or_timestamped(f)
+        if sizes.get(f, 0) == 0:
+            return False
+    return True
 
 
 @pytest.fixture
@@ -240,7 +292,6 @@ def atac_analysis_with_input_files(tmp_path):
 @pytest.fixture
 def atac_analysis_with_unmapped_input_files(atac_analysis_with_input_files):
     import pandas as pd
-    import yaml
 
     with atac_analysis_with_input_files as an:
         # We will update the annotation to add a 'data_source' column
@@ -249,14 +300,16 @@ def atac_analysis_with_unmapped_input_files(atac_analysis_with_input_files):
         df["data_source"] = "mapped"
         df.to_csv(csv, index=False)
         # We will update the config to add a line pointing to the aligned bams
-        conf = yaml.safe_load(open(an.pep))
+        with open(an.pep, "r") as handle:
+            conf = yaml.load(handle, Loader=SafeLoader)
         mapped_path = os.path.join(
             an.root_dir, "data/{sample_name}/mapped/{sample_name}.trimmed.bowtie2.filtered.bam"
         )
         conf["sample_modifiers"]["derive"]["attributes"].append("mapped")
         conf["sample_modifiers"]["derive"]["sources"]["mapped"] = mapped_path
 
-        yaml.safe_dump(conf, open(an.pep, "w"))
+        with open(an.pep, "w") as handle:
+            yaml.dump(conf, handle, Dumper=SafeDumper)
         a = ATACSeqAnalysis(from_pep=an.pep)
         a.load_data()
 
@@ -265,20 +318,20 @@ def atac_analysis_with_unmapped_input_files(atac_analysis_with_input_files):
 
 @pytest.fixture
 def subproject_config(atac_analysis):
-    import yaml
-
     annot = os.path.join(atac_analysis.root_dir, "metadata", "annotation.csv")
     subannot = os.path.join(atac_analysis.root_dir, "metadata", "sample_subannotation.csv")
 
     yaml_file = os.path.join(atac_analysis.root_dir, "metadata", "project_config.yaml")
-    conf = yaml.safe_load(open(yaml_file, "r"))
+    with open(yaml_file, "r") as handle:
+        conf = yaml.load(handle, Loader=SafeLoader)
     conf["project_modifiers"] = {
         "amend": {"test_subproject": {"sample_table": annot, "subsample_table": subannot}}
     }
     del conf["sample_table"]
     del conf["subsample_table"]
 
-    yaml.safe_dump(conf, open(yaml_file, "w"))
+    with open(yaml_file, "w") as handle:
+        yaml.dump(conf, handle, Dumper=SafeDumper)
 
     return yaml_file
 
@@ -480,69 +533,102 @@ def pep(atac_analysis_with_input_files):
     return atac_analysis_with_input_files.pep
 
 
-@pytest.fixture
-def various_analysis(tmp_path):
-    tmp_path = str(tmp_path)  # for Python2
-
-    # Let's make several "reallish" test projects
-    to_test = list()
-    project_prefix_name = "test-project"
-    data_type = "ATAC-seq"
-    genome_assemblies = [("human", "hg38"), ("mouse", "mm10")]  # ("human", "hg19")
-    factors = [1]  # 2, 5
-    features = [100]  # 1000, 10000
-    replicates = [2]  # 5
-
-    for organism, genome_assembly in genome_assemblies:
-        for n_factors in factors:
-            for n_features in features:
-                for n_replicates in replicates:
-                    project_name = "_".join(
-                        str(x)
-                        for x in [
-                            project_prefix_name,
-                            data_type,
-                            genome_assembly,
-                            n_factors,
-                            n_features,
-                            n_replicates,
-                        ]
-                    )
-
-                    an = generate_project(
-                        output_dir=tmp_path,
-                        project_name=project_name,
-                        organism=organism,
-                        genome_assembly=genome_assembly,
-                        data_type=data_type,
-                        n_factors=n_factors,
-                        n_replicates=n_replicates,
-                        n_features=n_features,
-                    )
-                    an.load_data()
-                    to_test.append(an)
-    return to_test
+def copy_project(project_dir, output_dir):
+    """
+    Copy a generated project into ``output_dir``, updating the absolute paths
+    in its configuration, and return the path to the new configuration file.
+    """
+    import shutil
+
+    new_project_dir = os.path.join(output_dir, os.path.basename(project_dir))
+    shutil.copytree(project_dir, new_project_dir)
+    config = os.path.join(new_project_dir, "metadata", "project_config.yaml")
+    with open(config, "r") as handle:
+        content = handle.read()
+    with open(config, "w") as handle:
+        handle.write(content.replace(project_dir, new_project_dir))
+    return config
+
+
+# Genome assemblies (and their organisms) to test "reallish" projects on.
+# Only the default one is tested unless running with --runslow.
+VARIOUS_GENOMES = {
+    "hg38": "human",
+    "mm10": "mouse",
+    # "hg19": "human",
+}
+DEFAULT_GENOME = "hg38"
+
+
+@pytest.fixture(scope="session")
+def various_projects(request, tmp_path_factory):
+    # Let's make "reallish" test projects for various genome assemblies.
+    # These are generated once per session and copied for each test.
+    from ngs_toolkit.demo import generate_projects
+
+    tmp_path = str(tmp_path_factory.mktemp("various_analysis"))
+    if request.config.getoption("--runslow"):
+        genomes = list(VARIOUS_GENOMES)
+    else:
+        genomes = [DEFAULT_GENOME]
+    configs = generate_projects(
+        output_path=tmp_path,
+        project_prefix_name="test-project",
+        data_types=["ATAC-seq"],
+        organisms=[VARIOUS_GENOMES[g] for g in genomes],
+        genome_assemblies=genomes,
+        n_factors=[1],
+        n_features=[100],
+        n_replicates=[2],
+        n_jobs=1,
+        initialize=False,
+    )
+    return {g: os.path.dirname(os.path.dirname(c)) for g, c in zip(genomes, configs)}
+
+
+@pytest.fixture(
+    scope="session",
+    params=[
+        g if g == DEFAULT_GENOME else pytest.param(g, marks=pytest.mark.slow)
+        for g in VARIOUS_GENOMES
+    ],
+)
+def various_project(request, various_projects):
+    return various_projects[request.param]
 
 
 @pytest.fixture
-@MEMORY.cache
-def chrom_file(tmp_path):
+def various_analysis(tmp_path, various_project):
+    an = ATACSeqAnalysis(from_pep=copy_project(various_project, str(tmp_path)))
+    an.load_data()
+    return an
+
+
+@pytest.fixture(scope="session")
+def chrom_file():
     from ngs_toolkit.utils import download_gzip_file
     import pandas as pd
 
+    # The file is kept across sessions and only downloaded if not present
+    os.makedirs(TEST_CACHE_DIR, exist_ok=True)
+    chrom_state_file = os.path.join(TEST_CACHE_DIR, "E002_15_coreMarks_hg38lift_dense.bed")
+    if file_exists_and_not_empty(chrom_state_file):
+        return chrom_state_file
+
     url = (
         "https://egg2.wustl.edu/roadmap/data/byFileType/"
         + "chromhmmSegmentations/ChmmModels/coreMarks/jointModel/"
         + "final/E002_15_coreMarks_hg38lift_dense.bed.gz"
     )
-    chrom_state_file = os.path.join(tmp_path, "E002_15_coreMarks_hg38lift_dense.bed")
-    download_gzip_file(url, chrom_state_file)
+    # download to a process-specific file so that parallel workers don't collide
+    tmp_file = chrom_state_file + "." + str(os.getpid())
+    download_gzip_file(url, tmp_file)
 
     # Test
-    assert os.path.exists(chrom_state_file)
-    assert os.stat(chrom_state_file).st_size > 0
-    b = pd.read_csv(chrom_state_file, skiprows=1, sep="\t")
+    assert file_exists_and_not_empty(tmp_file)
+    b = pd.read_csv(tmp_file, skiprows=1, sep="\t")
     assert b.shape == (281837, 9)
+    os.replace(tmp_file, chrom_state_file)
     return chrom_state_file
 
 
@@ -10,100 +10,115 @@ import pytest
 
 from ngs_toolkit import _CONFIG
 from ngs_toolkit.atacseq import ATACSeqAnalysis
-from .conftest import file_exists, file_exists_and_not_empty, CI, R, R_REASON
+from ngs_toolkit.constants import genome_to_ensembl_mapping
+from .conftest import (
+    file_exists,
+    file_exists_and_not_empty,
+    files_exist_and_not_empty,
+    CI,
+    R,
+    R_REASON,
+)
+
+
+_RNG = np.random.default_rng(0)
+
+GENOMIC_CONTEXT_SUFFIXES = (
+    ".bed",
+    ".exon.bed",
+    ".genebody.bed",
+    ".intergenic.bed",
+    ".intron.bed",
+    ".promoter.bed",
+    ".utr3.bed",
+    ".utr5.bed",
+)
 
 
 def test_get_consensus_sites(various_analysis):
-    for analysis in various_analysis:
-        with pytest.raises(IOError):
-            analysis.get_consensus_sites()
+    with pytest.raises(IOError):
+        various_analysis.get_consensus_sites()
 
 
 def test_get_supported_peaks(various_analysis):
-    for analysis in various_analysis:
-        analysis.support = pd.DataFrame(
-            np.random.binomial(1, 0.4, size=analysis.matrix_raw.shape),
-            index=analysis.matrix_raw.index,
-            columns=analysis.matrix_raw.columns,
-        )
-        fs = analysis.get_supported_peaks(samples=analysis.samples[:2])
-        assert fs.sum() < analysis.matrix_raw.shape[0]
+    matrix = various_analysis.matrix_raw
+    shape, index, columns = matrix.shape, matrix.index, matrix.columns
+    samples = various_analysis.samples[:2]
+    various_analysis.support = pd.DataFrame(
+        (_RNG.random(shape) < 0.4).astype(np.uint8), index=index, columns=columns, copy=False
+    )
+    fs = various_analysis.get_supported_peaks(samples=samples)
+    assert fs.sum() < shape[0]
 
 
 def test_measure_coverage(various_analysis):
-    for analysis in various_analysis:
-        with pytest.raises(IOError):
-            analysis.measure_coverage()
+    with pytest.raises(IOError):
+        various_analysis.measure_coverage()
 
 
 def test_consensus_set_loading(various_analysis):
-    for analysis in various_analysis:
-        assert hasattr(analysis, "sites")
-        assert isinstance(analysis.sites, pybedtools.BedTool)
+    assert hasattr(various_analysis, "sites")
+    assert isinstance(various_analysis.sites, pybedtools.BedTool)
 
 
 def test_coverage_matrix_loading(various_analysis):
-    for analysis in various_analysis:
-        assert hasattr(analysis, "matrix_raw")
-        assert isinstance(analysis.matrix_raw, pd.DataFrame)
-        assert analysis.matrix_raw.dtypes.all() == int
+    assert hasattr(various_analysis, "matrix_raw")
+    assert isinstance(various_analysis.matrix_raw, pd.DataFrame)
+    assert np.issubdtype(various_analysis.matrix_raw.values.dtype, np.integer)
 
 
 def test_set_consensus_set(various_analysis):
-    for analysis in various_analysis:
-        peaks = os.path.join(
-            analysis.results_dir, analysis.name + ".peak_set.bed")
-        analysis.set_consensus_sites(peaks)
-        assert hasattr(analysis, "sites")
-        sites = pd.read_csv(peaks, header=None)
-        assert len(analysis.sites) == sites.shape[0]
+    peaks = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".peak_set.bed")
+    various_analysis.set_consensus_sites(peaks)
+    assert hasattr(various_analysis, "sites")
+    with open(peaks, "rb") as handle:
+        n_sites = sum(1 for _ in handle)
+    assert len(various_analysis.sites) == n_sites
 
 
 def test_rpm_normalization(various_analysis):
-    for analysis in various_analysis:
-        qnorm = analysis.normalize_rpm(save=False)
-        assert hasattr(analysis, "matrix_norm")
-        assert isinstance(qnorm, pd.DataFrame)
-        assert qnorm.dtypes.all() == np.float
-        assert qnorm.isnull().sum().sum() == 0
-        rpm_file = os.path.join(
-            analysis.results_dir, analysis.name + ".matrix_norm.csv"
-        )
-        assert not file_exists(rpm_file)
-        qnorm = analysis.normalize_rpm(save=True)
-        assert hasattr(analysis, "matrix_norm")
-        assert isinstance(qnorm, pd.DataFrame)
-        assert qnorm.dtypes.all() == np.float
-        assert qnorm.isnull().sum().sum() == 0
-        assert file_exists_and_not_empty(rpm_file)
-        assert hasattr(analysis, "matrix_norm")
+    qnorm = various_analysis.normalize_rpm(save=False)
+    assert hasattr(various_analysis, "matrix_norm")
+    assert isinstance(qnorm, pd.DataFrame)
+    assert np.issubdtype(qnorm.values.dtype, np.floating)
+    assert qnorm.isnull().sum().sum() == 0
+    rpm_file = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".matrix_norm.csv"
+    )
+    assert not file_exists(rpm_file)
+    qnorm = various_analysis.normalize_rpm(save=True)
+    assert hasattr(various_analysis, "matrix_norm")
+    assert isinstance(qnorm, pd.DataFrame)
+    assert np.issubdtype(qnorm.values.dtype, np.floating)
+    assert qnorm.isnull().sum().sum() == 0
+    assert file_exists_and_not_empty(rpm_file)
+    assert hasattr(various_analysis, "matrix_norm")
 
 
 def test_python_quantile_normalization(various_analysis):
-    for analysis in various_analysis:
-        f = os.path.join(
-            analysis.results_dir, analysis.name + ".matrix_norm.csv")
-        qnorm_p = analysis.normalize_quantiles(implementation="Python", save=1)
-        assert hasattr(analysis, "matrix_norm")
-        assert isinstance(qnorm_p, pd.DataFrame)
-        assert qnorm_p.dtypes.all() == np.float
-        assert qnorm_p.isnull().sum().sum() == 0
-        assert file_exists_and_not_empty(f)
+    f = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".matrix_norm.csv")
+    qnorm_p = various_analysis.normalize_quantiles(implementation="Python", save=1)
+    assert hasattr(various_analysis, "matrix_norm")
+    assert isinstance(qnorm_p, pd.DataFrame)
+    assert np.issubdtype(qnorm_p.values.dtype, np.floating)
+    assert qnorm_p.isnull().sum().sum() == 0
+    assert file_exists_and_not_empty(f)
 
 
 @pytest.mark.skipif(
     not R,
     reason=R_REASON)
 def test_r_quantile_normalization(various_analysis):
-    for analysis in various_analysis:
-        f = os.path.join(
-            analysis.results_dir, analysis.name + ".matrix_norm.csv")
-        qnorm_r = analysis.normalize_quantiles(implementation="R", save=True)
-        assert hasattr(analysis, "matrix_norm")
-        assert isinstance(qnorm_r, pd.DataFrame)
-        assert qnorm_r.dtypes.all() == np.float
-        assert qnorm_r.isnull().sum().sum() == 0
-        assert file_exists_and_not_empty(f)
+    f = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".matrix_norm.csv")
+    qnorm_r = various_analysis.normalize_quantiles(implementation="R", save=True)
+    assert hasattr(various_analysis, "matrix_norm")
+    assert isinstance(qnorm_r, pd.DataFrame)
+    assert np.issubdtype(qnorm_r.values.dtype, np.floating)
+    assert qnorm_r.isnull().sum().sum() == 0
+    assert file_exists_and_not_empty(f)
 
 
 # def test_quantile_normalization(various_analysis):
@@ -113,21 +128,23 @@ def test_r_quantile_normalization(various_analysis):
 #         qnorm_p = analysis.normalize_quantiles(implementation="Python", save=1)
 #         assert hasattr(analysis, "matrix_norm")
 #         assert isinstance(qnorm_p, pd.DataFrame)
-#         assert qnorm_p.dtypes.all() == np.float
+#         assert np.issubdtype(qnorm_p.values.dtype, np.floating)
 #         assert qnorm_p.isnull().sum().sum() == 0
 #         assert file_exists_and_not_empty(f)
 
 #         qnorm_r = analysis.normalize_quantiles(implementation="R", save=True)
 #         assert hasattr(analysis, "matrix_norm")
 #         assert isinstance(qnorm_r, pd.DataFrame)
-#         assert qnorm_r.dtypes.all() == np.float
+#         assert np.issubdtype(qnorm_r.values.dtype, np.floating)
 #         assert qnorm_r.isnull().sum().sum() == 0
 #         assert file_exists_and_not_empty(f)
 
-#         cors = list()
-#         for col in qnorm_p.columns:
-#             cors.append(scipy.stats.pearsonr(qnorm_p[col], qnorm_r[col])[0])
-#         assert all(np.array(cors) > 0.99)
+#         a = qnorm_p.to_numpy()
+#         b = qnorm_r[qnorm_p.columns].to_numpy()
+#         a = a - a.mean(0)
+#         b = b - b.mean(0)
+#         cors = (a * b).sum(0) / np.sqrt((a * a).sum(0) * (b * b).sum(0))
+#         assert (cors > 0.99).all()
 
 
 @pytest.mark.skipif(CI, reason="CQN normalization not testable in CI")
@@ -135,7 +152,7 @@ def test_cqn_normalization(atac_analysis):
     qnorm = atac_analysis.normalize_cqn()
     assert hasattr(atac_analysis, "matrix_norm")
     assert isinstance(qnorm, pd.DataFrame)
-    assert qnorm.dtypes.all() == np.float
+    assert np.issubdtype(qnorm.values.dtype, np.floating)
     assert qnorm.isnull().sum().sum() == 0
     file = os.path.join(
         atac_analysis.results_dir, atac_analysis.name + ".matrix_norm.csv")
@@ -146,7 +163,7 @@ def test_pca_normalization(atac_analysis):
     qnorm = atac_analysis.normalize_pca(pc=1)
     assert hasattr(atac_analysis, "matrix_norm")
     assert isinstance(qnorm, pd.DataFrame)
-    assert qnorm.dtypes.all() == np.float
+    assert np.issubdtype(qnorm.values.dtype, np.floating)
     assert qnorm.isnull().sum().sum() == 0
     file = os.path.join(
         atac_analysis.results_dir, atac_analysis.name + ".matrix_norm.csv")
@@ -159,7 +176,7 @@ def test_vst_normalization(atac_analysis):
     qnorm = atac_analysis.normalize_vst(fitType="mean")
     assert hasattr(atac_analysis, "matrix_norm")
     assert isinstance(qnorm, pd.DataFrame)
-    assert qnorm.dtypes.all() == np.float
+    assert np.issubdtype(qnorm.values.dtype, np.floating)
     assert qnorm.isnull().sum().sum() == 0
     file = os.path.join(
         atac_analysis.results_dir, atac_analysis.name + ".matrix_norm.csv")
@@ -175,7 +192,7 @@ def test_normalize(atac_analysis):
     rpmnorm_d = atac_analysis.normalize(method="rpm", save=False)
     assert isinstance(rpmnorm_d, pd.DataFrame)
     assert hasattr(atac_analysis, "matrix_norm")
-    assert np.array_equal(rpmnorm_d, rpmnorm)
+    assert rpmnorm_d.equals(rpmnorm)
     del atac_analysis.matrix_norm
 
     qnorm = atac_analysis.normalize_quantiles(save=False)
@@ -185,7 +202,8 @@ def test_normalize(atac_analysis):
     qnorm_d = atac_analysis.normalize(method="quantile", save=False)
     assert isinstance(qnorm_d, pd.DataFrame)
     assert hasattr(atac_analysis, "matrix_norm")
-    assert np.array_equal(qnorm_d, qnorm)
+    assert atac_analysis.norm_method == "quantile"
+    pd.testing.assert_frame_equal(qnorm_d, qnorm)
     del atac_analysis.matrix_norm
 
     if not CI:
@@ -203,15 +221,14 @@ def test_normalize(atac_analysis):
 
 
 def test_get_matrix_stats(various_analysis):
-    for analysis in various_analysis:
-        annot = analysis.get_matrix_stats(matrix="matrix_raw")
-        output = os.path.join(
-            analysis.results_dir, analysis.name + ".stats_per_feature.csv"
-        )
-        assert file_exists_and_not_empty(output)
-        assert isinstance(annot, pd.DataFrame)
-        cols = ["mean", "variance", "std_deviation", "dispersion", "qv2", "amplitude"]
-        assert all([x in annot.columns.tolist() for x in cols])
+    annot = various_analysis.get_matrix_stats(matrix="matrix_raw")
+    output = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".stats_per_feature.csv"
+    )
+    assert file_exists_and_not_empty(output)
+    assert isinstance(annot, pd.DataFrame)
+    cols = ["mean", "variance", "std_deviation", "dispersion", "qv2", "amplitude"]
+    assert all([x in annot.columns.tolist() for x in cols])
 
 
 def test_get_peak_gene_annotation(atac_analysis):
@@ -221,13 +238,11 @@ def test_get_peak_gene_annotation(atac_analysis):
     if reference_dir is None:
         reference_dir = os.path.join(atac_analysis.root_dir, "reference")
 
-    mapping = {"hg19": "grch37", "hg38": "grch38", "mm10": "grcm38"}
-
     annot = atac_analysis.get_peak_gene_annotation(max_dist=1e10)
     tss = os.path.join(
         reference_dir,
         "{}.{}.gene_annotation.protein_coding.tss.bed".format(
-            atac_analysis.organism, mapping[atac_analysis.genome]
+            atac_analysis.organism, genome_to_ensembl_mapping[atac_analysis.genome]
         ),
     )
     assert file_exists_and_not_empty(tss)
@@ -241,28 +256,17 @@ def test_get_peak_genomic_location(atac_analysis):
     )
     if reference_dir is None:
         reference_dir = os.path.join(atac_analysis.root_dir, "reference")
-    prefix = os.path.join(reference_dir, "{}.{}.genomic_context")
+    prefix = os.path.join(
+        reference_dir,
+        "{}.{}.genomic_context".format(
+            atac_analysis.organism, genome_to_ensembl_mapping[atac_analysis.genome]
+        ),
+    )
 
-    fs = [
-        prefix + a
-        for a in [
-            ".bed",
-            ".exon.bed",
-            ".genebody.bed",
-            ".intergenic.bed",
-            ".intron.bed",
-            ".promoter.bed",
-            ".utr3.bed",
-            ".utr5.bed",
-        ]
-    ]
     annot = atac_analysis.get_peak_genomic_location()
 
     # check annotation files are produced
-    mapping = {"hg19": "grch37", "hg38": "grch38", "mm10": "grcm38"}
-    for f in fs:
-        f = f.format(atac_analysis.organism, mapping[atac_analysis.genome])
-        assert file_exists_and_not_empty(f)
+    assert files_exist_and_not_empty([prefix + a for a in GENOMIC_CONTEXT_SUFFIXES])
 
     assert isinstance(annot, pd.DataFrame)
     assert annot.shape[0] >= len(atac_analysis.sites)
@@ -288,8 +292,7 @@ def test_peak_chromatin_state(atac_analysis, chrom_file):
     assert isinstance(annot, pd.DataFrame)
     assert annot.shape[0] >= len(atac_analysis.sites)
 
-    for f in fs:
-        assert file_exists_and_not_empty(f)
+    assert files_exist_and_not_empty(fs)
     for attr in attrs:
         assert hasattr(atac_analysis, attr)
 
@@ -325,20 +328,19 @@ def test_annotate_features(atac_analysis, chrom_file):
 
 
 def test_plot_raw_coverage(various_analysis):
-    for analysis in various_analysis:
-        analysis.plot_raw_coverage()
-        output = os.path.join(
-            analysis.results_dir, analysis.name + ".raw_counts.violinplot.svg"
-        )
-        assert file_exists_and_not_empty(output)
-
-        attr = "A"
-        analysis.plot_raw_coverage(by_attribute=attr)
-        output = os.path.join(
-            analysis.results_dir,
-            analysis.name + ".raw_counts.violinplot.by_{}.svg".format(attr),
-        )
-        assert file_exists_and_not_empty(output)
+    various_analysis.plot_raw_coverage()
+    output = os.path.join(
+        various_analysis.results_dir, various_analysis.name + ".raw_counts.violinplot.svg"
+    )
+    assert file_exists_and_not_empty(output)
+
+    attr = "A"
+    various_analysis.plot_raw_coverage(by_attribute=attr)
+    output = os.path.join(
+        various_analysis.results_dir,
+        various_analysis.name + ".raw_counts.violinplot.by_{}.svg".format(attr),
+    )
+    assert file_exists_and_not_empty(output)
 
 
 def test_get_sex_chrom_ratio(analysis_normalized):
@@ -472,13 +474,7 @@ class Test_plot_peak_characteristics:
     #             ".mean_vs_dispersion.svg",
     #             ".mean_vs_variance.svg",
     #             ".mean_vs_std_deviation.svg",
-    #             ".qv2.distplot.svg",
-    #             ".iqr.distplot.svg",
-    #             ".amplitude.distplot.svg",
-    #             ".variance.distplot.svg",
-    #             ".std_deviation.distplot.svg",
-    #             ".mean.distplot.svg",
-    #             ".dispersion.distplot.svg"]
+    #             ".feature_statistics.distplot.svg"]
     #         outputs = [os.path.join(a.results_dir, "peak_characteristics", a.name + f) for f in outputs]
 
     #         a.get_peak_genomic_location()
@@ -502,13 +498,7 @@ class Test_plot_peak_characteristics:
                 ".mean_vs_dispersion.svg",
                 ".mean_vs_variance.svg",
                 ".mean_vs_std_deviation.svg",
-                ".qv2.distplot.svg",
-                ".iqr.distplot.svg",
-                ".amplitude.distplot.svg",
-                ".variance.distplot.svg",
-                ".std_deviation.distplot.svg",
-                ".mean.distplot.svg",
-                ".dispersion.distplot.svg",
+                ".feature_statistics.distplot.svg",
                 ".mean_vs_support.svg"]
             outputs = [os.path.join(a.results_dir, "peak_characteristics", a.name + f) for f in outputs]
 
@@ -518,5 +508,4 @@ class Test_plot_peak_characteristics:
             a.get_matrix_stats()
             a.plot_peak_characteristics()
 
-            for f in peak_outputs + outputs:
-                assert file_exists_and_not_empty(f)
+            assert files_exist_and_not_empty(peak_outputs + outputs)
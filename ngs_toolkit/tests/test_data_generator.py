@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import numpy as np
+
+from ngs_toolkit.demo import data_generator
+from ngs_toolkit.demo.data_generator import generate_peak_file, get_random_genes, set_seed
+
+
+def test_set_seed_makes_random_genes_reproducible(monkeypatch):
+    genes = ["GENE{}".format(i) for i in range(100)]
+    monkeypatch.setattr(data_generator, "_get_genes", lambda genome_assembly: genes)
+
+    set_seed(0)
+    np.random.seed(1)
+    first = get_random_genes(10)
+    set_seed(0)
+    np.random.seed(2)
+    second = get_random_genes(10)
+
+    assert first.tolist() == second.tolist()
+
+
+def test_set_seed_makes_peak_files_reproducible(tmp_path):
+    peak_set = tmp_path / "peak_set.bed"
+    peak_set.write_text(
+        "".join("chr1\t{}\t{}\n".format(i * 1000, i * 1000 + 500) for i in range(1, 101))
+    )
+    first = tmp_path / "first.bed"
+    second = tmp_path / "second.bed"
+
+    set_seed(0)
+    np.random.seed(1)
+    generate_peak_file(str(peak_set), str(first))
+    set_seed(0)
+    np.random.seed(2)
+    generate_peak_file(str(peak_set), str(second))
+
+    assert first.read_text() == second.read_text()
+
+
+def test_seeded_restores_random_state():
+    set_seed(0)
+    expected = data_generator._RNG.integers(2 ** 32 - 1, size=5)
+
+    set_seed(0)
+    data_generator._seeded(lambda: data_generator._RNG.integers(10), 1)
+    assert (data_generator._RNG.integers(2 ** 32 - 1, size=5) == expected).all()
@@ -140,5 +140,4 @@ class Test_differential_analysis:
     #     assert file_exists(outputs[0])
     #     assert os.path.isdir(outputs[0])
     #     for output in outputs[1:]:
-    #         assert file_exists(output)
-    #         assert os.stat(output).st_size > 0
+    #         assert file_exists_and_not_empty(output)
@@ -11,7 +11,7 @@ from .conftest import file_exists, file_exists_and_not_empty
 def test_rpm_normalization(rnaseq_analysis):
     with rnaseq_analysis as analysis:
         qnorm = analysis.normalize_rpm(save=False)
-        assert qnorm.dtypes.all() == np.float
+        assert np.issubdtype(qnorm.values.dtype, np.floating)
         assert hasattr(analysis, "matrix_norm")
         rpm_file = os.path.join(
             analysis.results_dir, analysis.name + ".matrix_norm.csv"
@@ -31,7 +31,7 @@ def test_normalize(rnaseq_analysis):
     qnorm_d = rnaseq_analysis.normalize(method="rpm", save=False)
     assert isinstance(qnorm_d, pd.DataFrame)
     assert hasattr(rnaseq_analysis, "matrix_norm")
-    assert np.array_equal(qnorm_d, qnorm)
+    assert qnorm_d.equals(qnorm)
     del rnaseq_analysis.matrix_norm
 
     qnorm = rnaseq_analysis.normalize_quantiles(save=False)
@@ -41,7 +41,8 @@ def test_normalize(rnaseq_analysis):
     qnorm_d = rnaseq_analysis.normalize(method="quantile", save=False)
     assert isinstance(qnorm_d, pd.DataFrame)
     assert hasattr(rnaseq_analysis, "matrix_norm")
-    assert np.array_equal(qnorm_d, qnorm)
+    assert rnaseq_analysis.norm_method == "quantile"
+    pd.testing.assert_frame_equal(qnorm_d, qnorm)
     del rnaseq_analysis.matrix_norm
 
 
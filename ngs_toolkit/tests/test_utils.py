@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pandas as pd
+
+from ngs_toolkit.utils import count_bed_overlaps, read_bed_coordinates
+
+
+def test_count_bed_overlaps(tmp_path):
+    regions = tmp_path / "regions.bed"
+    regions.write_text(
+        "chr1\t100\t200\n"  # touching, nested and partial overlaps
+        "chr1\t500\t600\n"  # no overlaps
+        "chr2\t100\t200\n"  # overlap only with a chr2 interval
+        "chr3\t100\t200\n"  # chromosome without intervals
+    )
+    intervals = tmp_path / "intervals.bed"
+    intervals.write_text(
+        "chr2\t150\t160\n"
+        "chr1\t50\t100\n"  # ends where region starts
+        "chr1\t200\t250\n"  # starts where region ends
+        "chr1\t120\t130\n"  # nested in region
+        "chr1\t50\t300\n"  # region nested in interval
+        "chr1\t190\t210\n"  # partial overlap
+        "chr1\t300\t400\n"  # between regions
+        "chr4\t100\t200\n"  # chromosome without regions
+    )
+
+    counts = count_bed_overlaps(
+        read_bed_coordinates(str(regions)), read_bed_coordinates(str(intervals))
+    )
+    assert isinstance(counts, np.ndarray)
+    assert counts.tolist() == [3, 0, 1, 0]
+
+
+def test_count_bed_overlaps_no_intervals():
+    regions = pd.DataFrame([["chr1", 100, 200]], columns=["chrom", "start", "end"])
+    intervals = pd.DataFrame(columns=["chrom", "start", "end"])
+    assert count_bed_overlaps(regions, intervals).tolist() == [0]
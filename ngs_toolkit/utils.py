@@ -474,6 +474,51 @@ def count_dataframe_values(x):
     return np.multiply(*x.shape) - x.isnull().sum().sum()
 
 
+def join_unique_by_group(df, by, sep=",", ignore=None):
+    """
+    Join the unique values (as strings) of each column of a dataframe
+    per group of rows sharing the values in the ``by`` columns.
+
+    Unique values are joined in order of first appearance.
+
+    Parameters
+    ----------
+    df : :class:`pandas.DataFrame`
+        Dataframe to aggregate.
+    by : :obj:`list`
+        Columns to group rows by.
+    sep : :obj:`str`
+        Separator used to join values.
+
+        Default is ",".
+    ignore : :obj:`str`, optional
+        A value to exclude before joining.
+
+    Returns
+    -------
+    :class:`pandas.DataFrame`
+        Dataframe with one row per group, sorted by ``by`` columns.
+    """
+    # hash the grouping columns only once and work on a single integer key
+    grouped = df.groupby(by)
+    groups = grouped.size().index
+    keys = grouped.ngroup().to_numpy()
+    joined = list()
+    for col in [c for c in df.columns if c not in by]:
+        values = pd.DataFrame({"key": keys, col: df[col].to_numpy().astype(str)})
+        if ignore is not None:
+            values = values.loc[values[col] != ignore]
+        values = (
+            values.drop_duplicates()
+            .groupby("key")[col]
+            .agg(sep.join)
+            .reindex(np.arange(len(groups)), fill_value="")
+        )
+        values.index = groups
+        joined.append(values)
+    return pd.concat(joined, axis=1).reset_index()
+
+
 def location_index_to_bed(index):
     """
     Get a pandas DataFrame with columns "chrom", "start", "end"
@@ -499,10 +544,11 @@ def location_index_to_bed(index):
     else:
         msg = "index is not list, Series or Index"
         TypeError(msg)
-    bed.loc[:, "chrom"] = index.str.split(":").str[0]
-    index2 = index.str.split(":").str[1]
-    bed.loc[:, "start"] = index2.str.split("-").str[0].astype(int)
-    bed.loc[:, "end"] = index2.str.split("-").str[1].astype(int)
+    # parse all strings in a single vectorized pass
+    parts = index.str.extract(r"^([^:]+):(\d+)-(\d+)$", expand=True)
+    bed.loc[:, "chrom"] = parts[0].values
+    bed.loc[:, "start"] = parts[1].values.astype(int)
+    bed.loc[:, "end"] = parts[2].values.astype(int)
     return bed
 
 
@@ -553,9 +599,9 @@ def bedtool_to_index(bedtool):
     else:
         msg = "Input not pybedtools.BedTool or string to BED file."
         raise ValueError(msg)
-    return [
-        str(i.chrom) + ":" + str(i.start) + "-" + str(i.stop) for i in bedtool
-    ]
+    return bed_to_index(
+        bedtool.to_dataframe(usecols=[0, 1, 2], dtype={"chrom": str})
+    ).tolist()
 
 
 def to_bed_index(sites):
@@ -1074,10 +1120,7 @@ def deseq_results_to_bed_file(
         ]
 
     # decompose index string (chrom:start-end) into columns
-    df["chrom"] = map(lambda x: x[0], df.index.str.split(":"))
-    r = pd.Series(map(lambda x: x[1], df.index.str.split(":")))
-    df["start"] = map(lambda x: x[0], r.str.split("-"))
-    df["end"] = map(lambda x: x[1], r.str.split("-"))
+    df = df.join(location_index_to_bed(df.index))
     df["name"] = df.index
     if normalize:
         MinMaxScaler(feature_range=(0, 1000)).fit_transform(
@@ -1250,6 +1293,55 @@ def bed_to_fasta(input_bed, output_fasta, genome_file):
         raise ValueError(msg)
 
 
+def read_bed_coordinates(input_bed: str) -> pd.DataFrame:
+    """Read only the 'chrom', 'start' and 'end' columns of a BED file into a dataframe."""
+    return pd.read_csv(
+        input_bed,
+        sep="\t",
+        header=None,
+        usecols=[0, 1, 2],
+        names=["chrom", "start", "end"],
+        dtype={"chrom": str, "start": np.int64, "end": np.int64},
+    )
+
+
+def count_bed_overlaps(regions: pd.DataFrame, intervals: pd.DataFrame) -> np.ndarray:
+    """
+    Count how many of ``intervals`` overlap each of ``regions``.
+
+    Both are half-open BED coordinates with "chrom", "start" and "end" columns,
+    so intervals merely touching a region (sharing only an endpoint) do not count,
+    as with ``bedtools intersect -c``.
+
+    Parameters
+    ----------
+    regions : :obj:`pandas.DataFrame`
+        Regions to count overlaps for.
+    intervals : :obj:`pandas.DataFrame`
+        Intervals to count.
+
+    Returns
+    -------
+    :obj:`numpy.ndarray`
+        Number of overlapping intervals for each row of ``regions``, in the same order.
+    """
+    starts = regions["start"].values
+    ends = regions["end"].values
+    counts = np.zeros(regions.shape[0], dtype=np.int64)
+    region_chroms = regions.groupby("chrom", sort=False).indices
+    # the intervals overlapping a region are those starting before its end
+    # minus those ending before (or at) its start, both countable by binary search
+    # in the sorted interval coordinates of each chromosome
+    for chrom, chrom_intervals in intervals.groupby("chrom", sort=False):
+        if chrom not in region_chroms:
+            continue
+        idx = region_chroms[chrom]
+        counts[idx] = np.searchsorted(
+            np.sort(chrom_intervals["start"].values), ends[idx], side="left"
+        ) - np.searchsorted(np.sort(chrom_intervals["end"].values), starts[idx], side="right")
+    return counts
+
+
 def read_bed_file_three_columns(input_bed: str) -> pd.DataFrame:
     """Read BED file into dataframe, make 'name' field from location."""
     bed = pd.read_csv(
@@ -1405,8 +1497,11 @@ def normalize_quantiles_r(array):
 
 def normalize_quantiles_p(df_input):
     """
-    Quantile normalization with a ure Python implementation.
-    Code from https://github.com/ShawnLYU/Quantile_Normalize.
+    Quantile normalization with a pure Python (NumPy) implementation.
+    Vectorized version of the algorithm in https://github.com/ShawnLYU/Quantile_Normalize.
+
+    Each value is replaced by the mean across samples of the sorted values at its rank,
+    with tied values getting the lowest rank.
 
     Parameters
     ----------
@@ -1415,21 +1510,18 @@ def normalize_quantiles_p(df_input):
 
     Returns
     -------
-    :class:`numpy.ndarray`
-        Normalized numeric array.
+    :class:`pandas.DataFrame`
+        Normalized dataframe.
     """
-    df = df_input.copy()
-    # compute rank
-    dic = {}
-    for col in df:
-        dic.update({col: sorted(df[col])})
-    sorted_df = pd.DataFrame(dic)
-    rank = sorted_df.mean(axis=1).tolist()
-    # sort
-    for col in df:
-        t = np.searchsorted(np.sort(df[col]), df[col])
-        df[col] = [rank[i] for i in t]
-    return df
+    values = df_input.to_numpy(dtype=np.float64)
+    sorted_values = np.sort(values, axis=0)
+    rank_means = sorted_values.mean(axis=1)
+    # rank and place values one column at a time into the sorted buffer, which is
+    # no longer needed, to avoid allocating a full matrix of ranks and an output matrix
+    for i in range(values.shape[1]):
+        ranks = np.searchsorted(sorted_values[:, i], values[:, i])
+        np.take(rank_means, ranks, out=sorted_values[:, i])
+    return pd.DataFrame(sorted_values, index=df_input.index, columns=df_input.columns)
 
 
 def cqn(matrix, gc_content, lengths):
@@ -1468,23 +1560,30 @@ def cqn(matrix, gc_content, lengths):
 
     importr("cqn")
 
-    cqn_out = r.cqn(matrix, x=gc_content, lengths=lengths)
+    # pass plain arrays to avoid building an R data.frame from the matrix
+    cqn_out = r.cqn(matrix.values, x=gc_content.values, lengths=lengths.values)
 
-    y_r = cqn_out[list(cqn_out.names).index("y")]
-    y = pd.DataFrame(np.array(y_r), index=matrix.index, columns=matrix.columns)
-    offset_r = cqn_out[list(cqn_out.names).index("offset")]
-    offset = pd.DataFrame(
-        np.array(offset_r), index=matrix.index, columns=matrix.columns
-    )
+    # sum the two outputs in place in a single array, labeled only once
+    names = list(cqn_out.names)
+    norm = np.array(cqn_out[names.index("y")], dtype=float)
+    norm += np.asarray(cqn_out[names.index("offset")])
 
-    return y + offset
+    return pd.DataFrame(norm, index=matrix.index, columns=matrix.columns)
 
 
 def count_bam_file_length(bam_file: str) -> int:
-    """Get length of BAM indexed file"""
+    """
+    Get number of reads in BAM file.
+
+    Uses the per-reference read counts stored in the BAM index if available,
+    otherwise iterates over all records of the file.
+    """
     import pysam
 
-    return pysam.AlignmentFile(bam_file).count()
+    with pysam.AlignmentFile(bam_file) as handle:
+        if handle.has_index():
+            return handle.mapped + handle.unmapped
+        return handle.count(until_eof=True)
 
 
 def count_lines(file: str) -> int:
@@ -1498,17 +1597,16 @@ def count_lines(file: str) -> int:
 
 def get_total_region_area(bed_file: str) -> int:
     """Get sum of BED records"""
-    peaks = pd.read_csv(bed_file, sep="\t", header=None)
-    return int((peaks.iloc[:, 2] - peaks.iloc[:, 1]).sum())
+    peaks = read_bed_coordinates(bed_file)
+    return int((peaks["end"] - peaks["start"]).sum())
 
 
 def get_region_lengths(bed_file: str) -> pd.Series:
     """Get length of each record in BED file"""
-    peaks = pd.read_csv(bed_file, sep="\t", header=None)
-    return peaks.iloc[:, 2] - peaks.iloc[:, 1]
+    peaks = read_bed_coordinates(bed_file)
+    return peaks["end"] - peaks["start"]
 
 
 def get_regions_per_chromosomes(bed_file: str) -> pd.Series:
     """Count record per chromosome in BED file"""
-    peaks = pd.read_csv(bed_file, sep="\t", header=None)
-    return peaks.iloc[:, 0].value_counts()
+    return read_bed_coordinates(bed_file)["chrom"].value_counts()